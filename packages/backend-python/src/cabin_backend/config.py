@@ -46,6 +46,8 @@ class IngestionSettings(BaseModel):
     dedup_method: str = "minhash"
     dedup_threshold: float = 0.92
     max_html_chars: int = 500_000
+    # Chunks per Chroma write; larger writes risk 413 Payload Too Large errors
+    write_batch_size: int = 50
 
     class Config:
         extra = "ignore"
@@ -60,6 +62,9 @@ class RetrievalSettings(BaseModel):
     cosine_floor: float = 0.05
     min_keyword_overlap: int = 2
     final_passages: int = 8
+    # .npz file the BM25 index is saved to after a rebuild and loaded from on
+    # start-up, skipping the full corpus fetch; disabled when unset
+    lexical_index_path: Optional[str] = None
 
     class Config:
         extra = "ignore"
@@ -75,6 +80,9 @@ class RerankerSettings(BaseModel):
     pool_size_multiplier: int = 2  # Reduced from 3 for better performance
     # Weight for combining fusion and reranker scores (0.0 = all fusion, 1.0 = all reranker)
     score_weight: float = 0.7
+    # Successful rerank responses are reused for the same query and candidates
+    cache_ttl_s: int = 900
+    cache_max_items: int = 1024  # 0 disables the cache
 
     class Config:
         extra = "ignore"
@@ -104,6 +112,8 @@ class EmbeddingCacheSettings(BaseModel):
     enabled: bool = True
     max_items: int = 5000  # Increased from 512 for better cache hit rate
     ttl_seconds: int = 3600  # Increased from 600 (1 hour instead of 10 minutes)
+    # SQLite file for embeddings that survive restarts and re-ingests; disabled when unset
+    persistent_path: Optional[str] = None
 
     class Config:
         extra = "ignore"
@@ -221,7 +231,10 @@ class AppConfig(BaseModel):
         return self.copy(update={"features": updated_features})
 
 
+@lru_cache(maxsize=8)
 def _resolve_config_path(path_str: str) -> Path:
+    # settings.app_config resolves the path on every access; resolve() is a
+    # filesystem walk, so remember it per configured string
     candidate = Path(path_str).expanduser()
     if not candidate.is_absolute():
         candidate = (PROJECT_ROOT / candidate).resolve()
@@ -387,6 +400,12 @@ class Settings(BaseSettings):
     chroma_host: str = Field("localhost", description="Hostname for ChromaDB", env="CHROMA_HOST")
     chroma_port: int = Field(8100, description="Port for ChromaDB", env="CHROMA_PORT")
     child_collection_name: str = Field("cabin_child_chunks", description="Name of the collection for child chunks")
+    # HNSW settings only take effect when the collection is created
+    chroma_hnsw_batch_size: int = Field(500, description="Vectors Chroma buffers before inserting them into the HNSW graph")
+    chroma_hnsw_sync_threshold: int = Field(5000, description="Vectors Chroma adds before persisting the HNSW graph to disk")
+    chroma_hnsw_ef_construction: Optional[int] = Field(None, description="HNSW ef_construction (Chroma default if unset)")
+    chroma_hnsw_max_neighbors: Optional[int] = Field(None, description="HNSW max neighbors per node, M (Chroma default if unset)")
+    chroma_hnsw_ef_search: Optional[int] = Field(None, description="HNSW ef_search (Chroma default if unset)")
 
     # LLM Provider Configuration (OpenAI-compatible)
     llm_base_url: str = Field("http://localhost:8000/v1", description="Base URL for the OpenAI-compatible LLM API")
@@ -399,6 +418,9 @@ class Settings(BaseSettings):
     embedding_model: str = Field("", description="The model name to use for generating embeddings (auto-discovered if empty)")
     embedding_dimensions: int = Field(256, description="The dimension of the embeddings")
     embedding_batch_size: int = Field(16, description="Batch size for embedding requests")
+    embedding_concurrency: int = Field(4, description="Maximum number of embedding batch requests in flight at once")
+    embedding_max_retries: int = Field(5, description="Retries per embedding request on rate limits, timeouts and server errors")
+    embedding_coalesce_window_ms: float = Field(2.0, description="How long a query embedding waits for concurrent queries to share its request (0 disables)")
 
     # RAG Pipeline Configuration
     parent_chunk_size: int = Field(4000, description="The target size for parent chunks in characters")
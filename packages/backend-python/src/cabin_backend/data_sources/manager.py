@@ -238,7 +238,7 @@ class DataSourceManager:
                     )
 
                     if ingest_request.document_id:
-                        self.vector_store.delete_document(ingest_request.document_id)
+                        await self.vector_store.delete_document_async(ingest_request.document_id)
 
                     # Process through existing chunking and vector store pipeline
                     start_time = time.perf_counter()
@@ -256,7 +256,7 @@ class DataSourceManager:
                                 score,
                             )
 
-                    self.vector_store.add_documents(child_chunks)
+                    await self.vector_store.add_documents_async(child_chunks)
                     elapsed = time.perf_counter() - start_time
 
                     stats["processed"] += 1
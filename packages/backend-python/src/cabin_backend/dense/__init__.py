@@ -2,5 +2,6 @@
 
 from .chroma_client import ChromaCollectionManager
 from .embed_index import EmbeddingClient
+from .embedding_cache import PersistentEmbeddingCache
 
-__all__ = ["ChromaCollectionManager", "EmbeddingClient"]
+__all__ = ["ChromaCollectionManager", "EmbeddingClient", "PersistentEmbeddingCache"]
@@ -4,14 +4,21 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 
 import chromadb
+from chromadb.api import AsyncClientAPI
+from chromadb.api.models.AsyncCollection import AsyncCollection
 from chromadb.api.models.Collection import Collection
 
 
 logger = logging.getLogger(__name__)
 
+# Ranking reads parent text from metadata, scores from distances and
+# diversifies on embeddings; the child documents would only add to every
+# query response.
+DEFAULT_QUERY_INCLUDE = ("metadatas", "distances", "embeddings")
+
 
 class ChromaCollectionManager:
     """Thin wrapper around ChromaDB collection operations with resilience hooks."""
@@ -24,15 +31,25 @@ class ChromaCollectionManager:
         collection_name: str,
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        probe_interval: float = 30.0,
+        hnsw_config: Optional[Dict[str, Any]] = None,
     ) -> None:
         self._host = host
         self._port = port
         self._collection_name = collection_name
         self._max_retries = max_retries
         self._retry_delay = retry_delay
+        # A heartbeat within this many seconds counts as proof of life; failed
+        # operations still force a fresh probe before their retry.
+        self._probe_interval = probe_interval
+        self._last_ok_time = 0.0
+        self._hnsw_config = {key: value for key, value in (hnsw_config or {}).items() if value is not None}
 
         self._client: Optional[chromadb.HttpClient] = None
         self._collection: Optional[Collection] = None
+        # The async client is bound to the running event loop, so it is created lazily.
+        self._async_client: Optional[AsyncClientAPI] = None
+        self._async_collection: Optional[AsyncCollection] = None
         self._connect()
 
     # ------------------------------------------------------------------
@@ -45,12 +62,14 @@ class ChromaCollectionManager:
             raise RuntimeError("Chroma collection not initialised")
         return self._collection
 
-    def ensure_connection(self) -> None:
+    def ensure_connection(self, *, force: bool = False) -> None:
         """Make sure the client/collection are alive and reconnect when needed."""
         try:
             if self._client and self._collection:
+                if not force and time.monotonic() - self._last_ok_time < self._probe_interval:
+                    return
                 self._client.heartbeat()
-                self._collection.count()
+                self._last_ok_time = time.monotonic()
                 return
         except Exception as exc:  # pragma: no cover - network path
             logger.warning("Chroma heartbeat failed (%s); reconnecting", exc)
@@ -75,7 +94,7 @@ class ChromaCollectionManager:
             )
         except Exception as exc:
             logger.error("Failed to add documents to ChromaDB: %s", exc)
-            self.ensure_connection()
+            self.ensure_connection(force=True)
             self.collection.add(
                 ids=list(ids),
                 embeddings=list(embeddings),
@@ -83,31 +102,88 @@ class ChromaCollectionManager:
                 metadatas=list(metadatas),
             )
 
+    async def add_async(
+        self,
+        *,
+        ids: Iterable[str],
+        embeddings: Iterable[List[float]],
+        documents: Iterable[str],
+        metadatas: Iterable[Dict[str, Any]],
+    ) -> None:
+        """Async version of add so ingest writes do not occupy a worker thread."""
+        add_args = {
+            "ids": list(ids),
+            "embeddings": list(embeddings),
+            "documents": list(documents),
+            "metadatas": list(metadatas),
+        }
+        try:
+            collection = await self._ensure_async_collection()
+            await collection.add(**add_args)
+        except Exception as exc:
+            logger.error("Failed to add documents to ChromaDB: %s", exc)
+            self._async_collection = None
+            collection = await self._ensure_async_collection()
+            await collection.add(**add_args)
+
+    async def delete_async(self, *, where: Dict[str, Any]) -> None:
+        collection = await self._ensure_async_collection()
+        await collection.delete(where=where)
+
     def query(
         self,
         *,
         query_embeddings: Iterable[List[float]],
         n_results: int,
         where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_QUERY_INCLUDE,
     ) -> Dict[str, Any]:
+        query_args = self._query_args(query_embeddings, n_results, where, include)
+        if self._matches_nothing(where):
+            return self._empty_query_result(query_args)
         self.ensure_connection()
-        query_args: Dict[str, Any] = {
-            "query_embeddings": list(query_embeddings),
-            "n_results": n_results,
-        }
-        if where:
-            query_args["where"] = where
         try:
             return self.collection.query(**query_args)
         except Exception as exc:
             logger.error("Chroma query failed: %s", exc)
-            self.ensure_connection()
+            self.ensure_connection(force=True)
             return self.collection.query(**query_args)
 
+    async def query_async(
+        self,
+        *,
+        query_embeddings: Iterable[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_QUERY_INCLUDE,
+    ) -> Dict[str, Any]:
+        """Async version of query so Chroma I/O can overlap with other work."""
+        query_args = self._query_args(query_embeddings, n_results, where, include)
+        if self._matches_nothing(where):
+            return self._empty_query_result(query_args)
+        try:
+            collection = await self._ensure_async_collection()
+            return await collection.query(**query_args)
+        except Exception as exc:
+            logger.error("Async Chroma query failed: %s", exc)
+            self._async_collection = None
+            collection = await self._ensure_async_collection()
+            return await collection.query(**query_args)
+
     def count(self) -> int:
         self.ensure_connection()
         return self.collection.count()
 
+    async def count_async(self) -> int:
+        try:
+            collection = await self._ensure_async_collection()
+            return await collection.count()
+        except Exception as exc:  # pragma: no cover - network path
+            logger.warning("Async Chroma count failed (%s); reconnecting", exc)
+            self._async_collection = None
+            collection = await self._ensure_async_collection()
+            return await collection.count()
+
     def reset(self) -> None:
         """Drop and recreate the managed collection."""
         self.ensure_connection()
@@ -117,19 +193,92 @@ class ChromaCollectionManager:
         except Exception as exc:  # pragma: no cover - chroma behaviour
             logger.warning("Failed to delete collection %s: %s", self._collection_name, exc)
         finally:
-            self._collection = self._client.get_or_create_collection(name=self._collection_name)
+            self._collection = self._client.get_or_create_collection(**self._collection_args())
+            # The async handle points at the dropped collection; reopen it on next use.
+            self._async_collection = None
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def _query_args(
+        query_embeddings: Iterable[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        include: Sequence[str],
+    ) -> Dict[str, Any]:
+        query_args: Dict[str, Any] = {
+            "query_embeddings": list(query_embeddings),
+            "n_results": n_results,
+            "include": list(include),
+        }
+        if where and not ChromaCollectionManager._matches_nothing(where):
+            query_args["where"] = ChromaCollectionManager._normalize_where(where)
+        return query_args
+
+    @staticmethod
+    def _matches_nothing(where: Optional[Dict[str, Any]]) -> bool:
+        """True if a field is filtered on an empty list of values.
+
+        Such a filter excludes every record, but Chroma rejects an empty
+        ``$in``, so the query is answered locally instead of sent.
+        """
+        return bool(where) and any(
+            not key.startswith("$") and isinstance(value, (list, tuple)) and not value
+            for key, value in where.items()
+        )
+
+    @staticmethod
+    def _empty_query_result(query_args: Dict[str, Any]) -> Dict[str, Any]:
+        """A query result with no hits for each query embedding."""
+        n_queries = len(query_args["query_embeddings"])
+        result: Dict[str, Any] = {"ids": [[] for _ in range(n_queries)]}
+        for field in query_args["include"]:
+            result[field] = [[] for _ in range(n_queries)]
+        return result
+
+    @staticmethod
+    def _normalize_where(where: Dict[str, Any]) -> Dict[str, Any]:
+        """Rewrites user filters into the form Chroma's where clause accepts.
+
+        A list value becomes ``$in`` (a single item plain equality), and
+        several fields are combined with ``$and``; Chroma rejects both
+        shapes as given. Operator clauses are passed through unchanged.
+        """
+        clauses: List[Dict[str, Any]] = []
+        for key, value in where.items():
+            if not key.startswith("$") and isinstance(value, (list, tuple)):
+                # Empty lists never get here; query() answers those without Chroma
+                value = value[0] if len(value) == 1 else {"$in": list(value)}
+            clauses.append({key: value})
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def _collection_args(self) -> Dict[str, Any]:
+        # Chroma applies the configuration only when it creates the collection
+        args: Dict[str, Any] = {"name": self._collection_name}
+        if self._hnsw_config:
+            args["configuration"] = {"hnsw": dict(self._hnsw_config)}
+        return args
+
+    async def _ensure_async_collection(self) -> AsyncCollection:
+        if self._async_collection is None:
+            if self._async_client is None:
+                self._async_client = await chromadb.AsyncHttpClient(host=self._host, port=self._port)
+            self._async_collection = await self._async_client.get_or_create_collection(
+                **self._collection_args()
+            )
+        return self._async_collection
+
     def _connect(self) -> None:
         delay = self._retry_delay
         for attempt in range(1, self._max_retries + 1):
             try:
                 self._client = chromadb.HttpClient(host=self._host, port=self._port)
                 self._client.heartbeat()
-                self._collection = self._client.get_or_create_collection(name=self._collection_name)
+                self._collection = self._client.get_or_create_collection(**self._collection_args())
+                self._async_collection = None
+                self._last_ok_time = time.monotonic()
                 logger.info(
                     "ChromaDB collection '%s' connected on attempt %d/%d",
                     self._collection_name,
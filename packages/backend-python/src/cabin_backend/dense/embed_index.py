@@ -4,14 +4,16 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import math
 import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
 import openai
 
 from ..telemetry.metrics import metrics
+from .embedding_cache import PersistentEmbeddingCache
 
 
 logger = logging.getLogger(__name__)
@@ -28,21 +30,39 @@ class EmbeddingClient:
         model: str,
         dimensions: int,
         batch_size: int = 16,
+        max_concurrency: int = 4,
+        coalesce_window_ms: float = 0.0,
+        max_retries: int = 5,
         l2_normalize: bool = True,
         cache_enabled: bool = False,
         cache_max_items: int = 0,
         cache_ttl_seconds: int = 600,
+        persistent_cache: Optional[PersistentEmbeddingCache] = None,
     ) -> None:
-        self._client = openai.OpenAI(api_key=api_key, base_url=base_url)
-        self._async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
+        # The SDK retries each request (one sub-batch) on connection errors, 429
+        # and 5xx with jittered exponential backoff, honouring Retry-After.
+        self._client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+        self._async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
         self._model = model
         self._dimensions = dimensions
         self._batch_size = max(1, batch_size)
+        self._max_concurrency = max(1, max_concurrency)
+        # One pool for all sync calls, so concurrent requests share max_concurrency
+        # connections instead of each spawning its own threads; threads start lazily.
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=self._max_concurrency, thread_name_prefix="embedding-fetch"
+        )
         self._l2_normalize = l2_normalize
         self._cache_enabled = cache_enabled and cache_max_items > 0
         self._cache_max_items = max(1, cache_max_items) if cache_max_items else 0
         self._cache_ttl = max(0, cache_ttl_seconds)
-        self._cache: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        # Entries are held as float16 arrays: a tenth of the memory of boxed
+        # Python floats, and the precision the vector store sends to Chroma.
+        self._cache: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._persistent_cache = persistent_cache
+        self._coalesce_window = max(0.0, coalesce_window_ms) / 1000
+        # Texts waiting to share one request in embed_query_async
+        self._pending_queries: Optional[_PendingQueries] = None
 
     def embed(self, texts: Sequence[str]) -> List[List[float]]:
         if not texts:
@@ -62,15 +82,29 @@ class EmbeddingClient:
         else:
             to_fetch = list(enumerate(texts))
 
+        if to_fetch and self._persistent_cache is not None:
+            to_fetch = self._read_persistent(to_fetch, results)
+
         if to_fetch:
-            fetch_texts = [text for _, text in to_fetch]
+            # Repeated texts in one call (shared boilerplate chunks) are embedded once
+            fetch_texts = list(dict.fromkeys(text for _, text in to_fetch))
             fetched_embeddings = self._fetch_embeddings(fetch_texts)
-            for (index, text), vector in zip(to_fetch, fetched_embeddings):
-                results[index] = vector
-                if self._cache_enabled:
+            fetched = dict(zip(fetch_texts, fetched_embeddings))
+            for index, text in to_fetch:
+                results[index] = fetched[text]
+            if self._cache_enabled:
+                for text, vector in fetched.items():
                     self._cache_set(text, vector)
+            if self._persistent_cache is not None:
+                self._write_persistent(fetch_texts, fetched_embeddings)
 
         ordered = [results[idx] for idx in range(len(texts))]
+        logger.debug(
+            "Embedded %d texts: cached=%d, embedded=%d",
+            len(texts),
+            len(texts) - len(to_fetch),
+            len(to_fetch),
+        )
         if self._cache_enabled:
             hits = len(texts) - len(to_fetch)
             misses = len(to_fetch)
@@ -97,15 +131,29 @@ class EmbeddingClient:
         else:
             to_fetch = list(enumerate(texts))
 
+        if to_fetch and self._persistent_cache is not None:
+            to_fetch = await asyncio.to_thread(self._read_persistent, to_fetch, results)
+
         if to_fetch:
-            fetch_texts = [text for _, text in to_fetch]
+            # Repeated texts in one call (shared boilerplate chunks) are embedded once
+            fetch_texts = list(dict.fromkeys(text for _, text in to_fetch))
             fetched_embeddings = await self._fetch_embeddings_async(fetch_texts)
-            for (index, text), vector in zip(to_fetch, fetched_embeddings):
-                results[index] = vector
-                if self._cache_enabled:
+            fetched = dict(zip(fetch_texts, fetched_embeddings))
+            for index, text in to_fetch:
+                results[index] = fetched[text]
+            if self._cache_enabled:
+                for text, vector in fetched.items():
                     self._cache_set(text, vector)
+            if self._persistent_cache is not None:
+                await asyncio.to_thread(self._write_persistent, fetch_texts, fetched_embeddings)
 
         ordered = [results[idx] for idx in range(len(texts))]
+        logger.debug(
+            "Embedded %d texts: cached=%d, embedded=%d",
+            len(texts),
+            len(texts) - len(to_fetch),
+            len(to_fetch),
+        )
         if self._cache_enabled:
             hits = len(texts) - len(to_fetch)
             misses = len(to_fetch)
@@ -113,6 +161,54 @@ class EmbeddingClient:
             metrics.increment("embedding.cache.misses", misses)
         return ordered
 
+    async def embed_query_async(self, text: str) -> List[float]:
+        """Embeds one query, sharing a request with queries that arrive within the coalesce window."""
+        if self._coalesce_window <= 0:
+            return (await self.embed_async([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending_queries
+        if pending is None or pending.loop is not loop or len(pending.texts) >= self._batch_size:
+            pending = _PendingQueries(loop)
+            self._pending_queries = pending
+            # Held on the batch so the flush task is not garbage collected early
+            pending.task = loop.create_task(self._flush_queries(pending))
+
+        future = pending.futures.get(text)
+        if future is None:
+            future = loop.create_future()
+            pending.texts.append(text)
+            pending.futures[text] = future
+        # Shielded so one cancelled caller does not fail others waiting on the same text
+        return await asyncio.shield(future)
+
+    async def _flush_queries(self, pending: "_PendingQueries") -> None:
+        try:
+            await asyncio.sleep(self._coalesce_window)
+            if self._pending_queries is pending:
+                self._pending_queries = None
+            metrics.increment("embedding.coalesced_queries", len(pending.texts))
+            vectors = await self.embed_async(pending.texts)
+        except BaseException as exc:
+            # Cancellation (e.g. at shutdown) included: every waiting caller
+            # must be released, or it would await its future forever
+            if self._pending_queries is pending:
+                self._pending_queries = None
+            cancelled = isinstance(exc, asyncio.CancelledError)
+            for future in pending.futures.values():
+                if not future.done():
+                    if cancelled:
+                        future.cancel()
+                    else:
+                        future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for text, vector in zip(pending.texts, vectors):
+            future = pending.futures[text]
+            if not future.done():
+                future.set_result(vector)
+
     def health_check(self) -> bool:
         try:
             self.embed(["ping"])
@@ -122,43 +218,86 @@ class EmbeddingClient:
             return False
 
     def _fetch_embeddings(self, texts: Sequence[str]) -> List[List[float]]:
-        embeddings: List[List[float]] = []
-        for batch in _batched(texts, self._batch_size):
-            # Only include dimensions parameter if it's > 0 and model supports it
-            # BGE-M3 and similar models have fixed dimensions and don't support this parameter
-            embedding_args = {
-                "input": list(batch),
-                "model": self._model,
-            }
-            if self._dimensions > 0 and not self._model.startswith(("bge-", "text-embedding-bge")):
-                embedding_args["dimensions"] = self._dimensions
-
-            response = self._client.embeddings.create(**embedding_args)
-            for item in response.data:
-                vector = list(item.embedding)
-                if self._l2_normalize:
-                    vector = _l2_normalise(vector)
-                embeddings.append(vector)
-        return embeddings
+        batches = list(_batched(texts, self._batch_size))
+        if len(batches) <= 1 or self._max_concurrency <= 1:
+            return [vector for batch in batches for vector in self._embed_batch(batch)]
+
+        # Sub-batches go out on parallel connections; map() keeps input order.
+        return [vector for vectors in self._fetch_pool.map(self._embed_batch, batches) for vector in vectors]
 
     async def _fetch_embeddings_async(self, texts: Sequence[str]) -> List[List[float]]:
         """Async version of _fetch_embeddings for concurrent API calls."""
-        embeddings: List[List[float]] = []
-        for batch in _batched(texts, self._batch_size):
-            embedding_args = {
-                "input": list(batch),
-                "model": self._model,
-            }
-            if self._dimensions > 0 and not self._model.startswith(("bge-", "text-embedding-bge")):
-                embedding_args["dimensions"] = self._dimensions
-
-            response = await self._async_client.embeddings.create(**embedding_args)
-            for item in response.data:
-                vector = list(item.embedding)
-                if self._l2_normalize:
-                    vector = _l2_normalise(vector)
-                embeddings.append(vector)
-        return embeddings
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def embed_batch(batch: Sequence[str]) -> List[List[float]]:
+            async with semaphore:
+                response = await self._async_client.embeddings.create(**self._embedding_args(batch))
+            return self._vectors_from_response(response)
+
+        results = await asyncio.gather(*(embed_batch(batch) for batch in _batched(texts, self._batch_size)))
+        return [vector for vectors in results for vector in vectors]
+
+    def _embed_batch(self, batch: Sequence[str]) -> List[List[float]]:
+        response = self._client.embeddings.create(**self._embedding_args(batch))
+        return self._vectors_from_response(response)
+
+    def _embedding_args(self, batch: Sequence[str]) -> Dict[str, object]:
+        # Only include dimensions parameter if it's > 0 and model supports it
+        # BGE-M3 and similar models have fixed dimensions and don't support this parameter
+        embedding_args: Dict[str, object] = {
+            "input": list(batch),
+            "model": self._model,
+        }
+        if self._dimensions > 0 and not self._model.startswith(("bge-", "text-embedding-bge")):
+            embedding_args["dimensions"] = self._dimensions
+        return embedding_args
+
+    def _vectors_from_response(self, response) -> List[List[float]]:
+        if not self._l2_normalize:
+            return [list(item.embedding) for item in response.data]
+        if not response.data:
+            return []
+        # Normalise the whole batch in one numpy pass rather than per component
+        matrix = np.asarray([item.embedding for item in response.data], dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    def _read_persistent(
+        self,
+        to_fetch: List[Tuple[int, str]],
+        results: Dict[int, List[float]],
+    ) -> List[Tuple[int, str]]:
+        """Fill ``results`` from the on-disk cache and return what is still missing."""
+        keys = [self._persistent_key(text) for _, text in to_fetch]
+        try:
+            stored = self._persistent_cache.get_many(keys)
+        except Exception as exc:  # pragma: no cover - disk path
+            logger.warning("Persistent embedding cache read failed: %s", exc)
+            return to_fetch
+
+        missing: List[Tuple[int, str]] = []
+        for (index, text), key in zip(to_fetch, keys):
+            vector = stored.get(key)
+            if vector is None:
+                missing.append((index, text))
+                continue
+            results[index] = vector
+            if self._cache_enabled:
+                self._cache_set(text, vector)
+        metrics.increment("embedding.disk_cache.hits", len(to_fetch) - len(missing))
+        return missing
+
+    def _write_persistent(self, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        try:
+            self._persistent_cache.set_many(
+                (self._persistent_key(text), vector) for text, vector in zip(texts, vectors)
+            )
+        except Exception as exc:  # pragma: no cover - disk path
+            logger.warning("Persistent embedding cache write failed: %s", exc)
+
+    def _persistent_key(self, text: str) -> bytes:
+        return PersistentEmbeddingCache.make_key(self._model, self._dimensions, text)
 
     def _cache_get(self, key: str, now: float) -> Optional[List[float]]:
         entry = self._cache.get(key)
@@ -170,25 +309,30 @@ class EmbeddingClient:
             return None
         # Move to end (recently used)
         self._cache.move_to_end(key)
-        return list(vector)
+        return vector.astype(np.float32).tolist()
 
     def _cache_set(self, key: str, vector: List[float]) -> None:
         if not self._cache_enabled:
             return
         if key in self._cache:
             self._cache.move_to_end(key)
-        self._cache[key] = (list(vector), time.time())
+        self._cache[key] = (np.asarray(vector, dtype=np.float16), time.time())
         if len(self._cache) > self._cache_max_items:
             self._cache.popitem(last=False)
 
 
+class _PendingQueries:
+    """Query texts collected on one event loop for a single embeddings call."""
+
+    __slots__ = ("loop", "texts", "futures", "task")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.texts: List[str] = []
+        self.futures: Dict[str, "asyncio.Future[List[float]]"] = {}
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
 def _batched(iterable: Sequence[str], batch_size: int) -> Iterable[Sequence[str]]:
     for index in range(0, len(iterable), batch_size):
         yield iterable[index : index + batch_size]
-
-
-def _l2_normalise(vector: List[float]) -> List[float]:
-    norm = math.sqrt(sum(component * component for component in vector))
-    if norm == 0:
-        return vector
-    return [component / norm for component in vector]
@@ -0,0 +1,65 @@
+"""Persistent, content-addressed embedding cache backed by SQLite."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+_SELECT_CHUNK = 500
+
+
+class PersistentEmbeddingCache:
+    """Stores vectors on disk keyed by a hash of (model, dimensions, text).
+
+    Vectors are kept as float16 blobs, which halves the file size compared
+    to float32 and matches the precision the vector store hands to Chroma.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS emb (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        logger.info("Persistent embedding cache opened at %s", self._path)
+
+    @staticmethod
+    def make_key(model: str, dimensions: int, text: str) -> bytes:
+        return hashlib.blake2b(f"{model}|{dimensions}|{text}".encode("utf-8"), digest_size=20).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _SELECT_CHUNK):
+                chunk = unique_keys[start : start + _SELECT_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    def set_many(self, items: Iterable[Tuple[bytes, Sequence[float]]]) -> None:
+        rows = [(key, np.asarray(vector, dtype=np.float16).tobytes()) for key, vector in items]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)", rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
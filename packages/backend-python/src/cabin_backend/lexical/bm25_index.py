@@ -3,62 +3,439 @@
 from __future__ import annotations
 
 import logging
-from typing import Iterable, List, Optional, Sequence, Tuple
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from rank_bm25 import BM25Okapi
+import numpy as np
 
 
 logger = logging.getLogger(__name__)
 
 
 class BM25Index:
-    """Simple BM25 wrapper that handles incremental corpus updates."""
+    """Simple BM25 wrapper that handles incremental corpus updates.
 
-    def __init__(self, *, language_stopwords: Sequence[str] | None = None, min_token_length: int = 3) -> None:
+    Scoring follows the Okapi variant used by ``rank_bm25`` (including its
+    epsilon floor for negative IDF values), but the corpus is held as
+    term-major postings arrays so a query only touches the documents that
+    contain its terms.
+
+    The index is shared between ingestion and query threads: every public
+    method holds ``_lock`` while it reads or replaces the index state, so a
+    query never mixes arrays from before and after an update.
+    """
+
+    def __init__(
+        self,
+        *,
+        language_stopwords: Sequence[str] | None = None,
+        min_token_length: int = 3,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> None:
         self._language_stopwords = set(language_stopwords or [])
         self._min_token_length = max(1, min_token_length)
-        self._corpus_tokens: List[List[str]] = []
+        self._k1 = k1
+        self._b = b
+        self._epsilon = epsilon
+        # Reentrant because public methods call each other
+        self._lock = threading.RLock()
         self._doc_ids: List[str] = []
-        self._bm25: BM25Okapi | None = None
+        self._doc_id_to_row: Dict[str, int] = {}
+        self._vocab: Dict[str, int] = {}
+        self._idf = np.zeros(0, dtype=np.float64)
+        # Postings in document order, appended to as documents are added
+        self._posting_terms = np.zeros(0, dtype=np.int32)
+        self._posting_doc_rows = np.zeros(0, dtype=np.int32)
+        self._posting_doc_tfs = np.zeros(0, dtype=np.float32)
+        # Postings in CSC layout: the rows and precomputed BM25 contributions
+        # for term t live in
+        # _postings_rows/_postings_scores[_postings_indptr[t]:_postings_indptr[t + 1]].
+        self._postings_indptr = np.zeros(1, dtype=np.int64)
+        self._postings_rows = np.zeros(0, dtype=np.int32)
+        self._postings_scores = np.zeros(0, dtype=np.float64)
+        self._doc_lens = np.zeros(0, dtype=np.float64)
+        self._avgdl = 0.0
+        # Largest tf/length part of any posting per term; times the IDF it
+        # bounds what the term can add to a document score (MaxScore).
+        self._max_tf_part = np.zeros(0, dtype=np.float64)
 
     def build(self, corpus_tokens: Iterable[Iterable[str]], doc_ids: Optional[Iterable[str]] = None) -> None:
-        self._corpus_tokens = [list(tokens) for tokens in corpus_tokens]
+        token_lists = [list(tokens) for tokens in corpus_tokens]
         if doc_ids is not None:
             ids_list = list(doc_ids)
-            if len(ids_list) != len(self._corpus_tokens):
+            if len(ids_list) != len(token_lists):
                 raise ValueError("doc_ids length must match corpus size")
-            self._doc_ids = ids_list
         else:
-            self._doc_ids = [str(index) for index in range(len(self._corpus_tokens))]
-        self._bm25 = BM25Okapi(self._corpus_tokens)
-        logger.debug("BM25 index built with %d documents", len(self._corpus_tokens))
+            ids_list = [str(index) for index in range(len(token_lists))]
+
+        with self._lock:
+            self._doc_ids = []
+            self._doc_id_to_row = {}
+            self._vocab = {}
+            self._posting_terms = np.zeros(0, dtype=np.int32)
+            self._posting_doc_rows = np.zeros(0, dtype=np.int32)
+            self._posting_doc_tfs = np.zeros(0, dtype=np.float32)
+            self._doc_lens = np.zeros(0, dtype=np.float64)
+            self._append(token_lists, ids_list)
+        logger.debug("BM25 index built with %d documents", len(ids_list))
+
+    def add_documents(self, doc_ids: Iterable[str], corpus_tokens: Iterable[Iterable[str]]) -> None:
+        """Appends new documents without re-reading the existing corpus.
+
+        Corpus statistics (IDF, average length) are recomputed from the stored
+        postings, so the result matches a full build over the combined corpus.
+        Replacing or removing documents still requires ``build``.
+        """
+        ids_list = list(doc_ids)
+        token_lists = [list(tokens) for tokens in corpus_tokens]
+        if len(ids_list) != len(token_lists):
+            raise ValueError("doc_ids length must match corpus size")
+        with self._lock:
+            if len(set(ids_list)) != len(ids_list) or any(doc_id in self._doc_id_to_row for doc_id in ids_list):
+                raise ValueError("doc_ids must be new to the index")
+            if ids_list:
+                self._append(token_lists, ids_list)
+                logger.debug("BM25 index extended by %d documents to %d", len(ids_list), len(self._doc_ids))
 
     def update(self, corpus_tokens: Iterable[Iterable[str]], doc_ids: Optional[Iterable[str]] = None) -> None:
-        # For now rebuild; future work could do incremental updates.
+        # Replaces the whole corpus; add_documents appends without a rebuild.
         self.build(corpus_tokens, doc_ids)
 
     def scores(self, query_tokens: Sequence[str]) -> List[float]:
-        if not self._bm25 or not self._corpus_tokens:
-            return []
-        if not query_tokens:
-            return [0.0] * len(self._corpus_tokens)
-        raw_scores = self._bm25.get_scores(list(query_tokens))
-        if not len(raw_scores):
-            return []
-        max_score = float(raw_scores.max())
+        with self._lock:
+            if not self._doc_ids:
+                return []
+            if not query_tokens:
+                return [0.0] * len(self._doc_ids)
+            raw_scores = self._score_array(query_tokens)
+            max_score = float(raw_scores.max())
+            if max_score <= 0:
+                return [0.0] * len(self._doc_ids)
+            return (raw_scores / max_score).tolist()
+
+    def scores_for_ids(self, query_tokens: Sequence[str], doc_ids: Sequence[str]) -> np.ndarray:
+        """Normalised scores for ``doc_ids`` in the given order; unknown ids score 0."""
+        with self._lock:
+            return self.score_candidates(query_tokens, self.rows_for_ids(doc_ids))
+
+    def rows_for_ids(self, doc_ids: Sequence[str]) -> np.ndarray:
+        """Corpus rows for ``doc_ids`` in the given order; unknown ids map to -1."""
+        with self._lock:
+            return np.fromiter(
+                (self._doc_id_to_row.get(doc_id, -1) for doc_id in doc_ids),
+                dtype=np.int64,
+                count=len(doc_ids),
+            )
+
+    def matched_term_counts(self, query_tokens: Sequence[str], candidate_rows: np.ndarray) -> np.ndarray:
+        """Number of distinct query terms occurring in each row; negative rows count 0."""
+        counts = np.zeros(len(candidate_rows), dtype=np.int64)
+        rows = np.asarray(candidate_rows, dtype=np.int64)
+        with self._lock:
+            if not self._doc_ids or not len(candidate_rows):
+                return counts
+            for token in dict.fromkeys(query_tokens):
+                term_id = self._vocab.get(token)
+                if term_id is not None:
+                    counts += self._term_hits(term_id, rows)[1]
+        return counts
+
+    def score_candidates(self, query_tokens: Sequence[str], candidate_rows: np.ndarray) -> np.ndarray:
+        """Normalised scores for the given corpus rows; negative rows score 0.
+
+        The normaliser is the corpus-wide best score, which MaxScore finds
+        without scoring every posting; the candidates themselves are looked
+        up in the query terms' postings, so neither step visits the whole
+        posting lists of common terms.
+        """
+        result = np.zeros(len(candidate_rows), dtype=np.float64)
+        with self._lock:
+            if not self._doc_ids or not query_tokens or not len(candidate_rows):
+                return result
+            _, top_scores = self._max_score_candidates(query_tokens, 1)
+            max_score = float(top_scores.max()) if len(top_scores) else 0.0
+            if max_score <= 0:
+                return result
+            return self._scores_for_rows(query_tokens, np.asarray(candidate_rows, dtype=np.int64)) / max_score
+
+    def top_k(self, query_tokens: Sequence[str], k: int) -> List[Tuple[str, float]]:
+        """Return the ``k`` best (doc_id, score) pairs; documents without a matching term are skipped."""
+        with self._lock:
+            if not self._doc_ids or not query_tokens or k <= 0:
+                return []
+            rows, raw_scores = self._max_score_candidates(query_tokens, k)
+            doc_ids = self._doc_ids
+        max_score = float(raw_scores.max()) if len(raw_scores) else 0.0
         if max_score <= 0:
-            return [0.0] * len(self._corpus_tokens)
-        return [float(score) / max_score for score in raw_scores]
+            return []
+        if len(raw_scores) > k:
+            # Keep every score tied with the k-th so ties can go to the lower row
+            keep = np.flatnonzero(raw_scores >= np.partition(raw_scores, -k)[-k])
+            rows, raw_scores = rows[keep], raw_scores[keep]
+        # Stable, like sorting by score descending: ties stay in row order
+        best = np.argsort(-raw_scores, kind="stable")[:k]
+        return [
+            (doc_ids[row], score / max_score)
+            for row, score in zip(rows[best].tolist(), raw_scores[best].tolist())
+        ]
 
     def query(self, query_tokens: Sequence[str]) -> List[Tuple[str, float]]:
         """Return (doc_id, score) pairs sorted by score descending."""
-        scores = self.scores(query_tokens)
+        with self._lock:
+            scores = self.scores(query_tokens)
+            doc_ids = list(self._doc_ids)
         return sorted(
-            zip(self._doc_ids, scores, strict=False),
+            zip(doc_ids, scores, strict=False),
             key=lambda item: item[1],
             reverse=True,
         )
 
     @property
     def corpus_size(self) -> int:
-        return len(self._corpus_tokens)
+        return len(self._doc_ids)
+
+    def save(self, path: str | Path, *, fingerprint: str = "") -> None:
+        """Writes the postings and ids to ``path`` as an uncompressed ``.npz``.
+
+        Derived statistics are not stored; ``load`` recomputes them, which is
+        a few array passes instead of re-reading and re-tokenizing the corpus.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self._lock:
+            # Updates replace these arrays rather than writing into them, so
+            # the references taken here stay consistent after the lock is released
+            doc_ids = self._doc_ids
+            terms = list(self._vocab)
+            posting_terms = self._posting_terms
+            posting_doc_rows = self._posting_doc_rows
+            posting_doc_tfs = self._posting_doc_tfs
+            doc_lens = self._doc_lens
+        with tmp_path.open("wb") as handle:
+            np.savez(
+                handle,
+                fingerprint=np.array(fingerprint),
+                params=np.array([self._k1, self._b, self._epsilon], dtype=np.float64),
+                doc_ids=np.array(doc_ids, dtype=str),
+                terms=np.array(terms, dtype=str),
+                posting_terms=posting_terms,
+                posting_doc_rows=posting_doc_rows,
+                posting_doc_tfs=posting_doc_tfs,
+                doc_lens=doc_lens,
+            )
+        os.replace(tmp_path, path)
+        logger.debug("BM25 index with %d documents saved to %s", len(doc_ids), path)
+
+    def load(self, path: str | Path, *, fingerprint: str = "") -> bool:
+        """Restores an index written by ``save``; returns False if it is missing or does not match."""
+        path = Path(path)
+        if not path.exists():
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                logger.debug("Ignoring BM25 index at %s: fingerprint mismatch", path)
+                return False
+            if not np.array_equal(data["params"], [self._k1, self._b, self._epsilon]):
+                logger.debug("Ignoring BM25 index at %s: scoring parameters changed", path)
+                return False
+            doc_ids = data["doc_ids"].tolist()
+            terms = data["terms"].tolist()
+            posting_terms = data["posting_terms"]
+            posting_doc_rows = data["posting_doc_rows"]
+            posting_doc_tfs = data["posting_doc_tfs"]
+            doc_lens = data["doc_lens"]
+
+        with self._lock:
+            self._refresh_statistics(
+                {term: term_id for term_id, term in enumerate(terms)},
+                posting_terms,
+                posting_doc_rows,
+                posting_doc_tfs,
+                doc_lens,
+            )
+            self._doc_ids = doc_ids
+            self._doc_id_to_row = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        logger.debug("BM25 index with %d documents loaded from %s", len(doc_ids), path)
+        return True
+
+    def _append(self, token_lists: List[List[str]], ids_list: List[str]) -> None:
+        # Callers hold _lock. New arrays, lists and dicts are built and then
+        # assigned rather than updated in place, so references that a reader
+        # took under the lock (top_k's doc ids, save's arrays) stay consistent.
+        vocab = dict(self._vocab)
+        first_row = len(self._doc_ids)
+        term_ids: List[int] = []
+        rows: List[int] = []
+        tfs: List[int] = []
+        for row, tokens in enumerate(token_lists, start=first_row):
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                rows.append(row)
+                tfs.append(tf)
+
+        # Postings are kept in document order; a stable sort by term id turns
+        # them into the CSC layout used for scoring.
+        posting_terms = np.concatenate((self._posting_terms, np.asarray(term_ids, dtype=np.int32)))
+        posting_doc_rows = np.concatenate((self._posting_doc_rows, np.asarray(rows, dtype=np.int32)))
+        posting_doc_tfs = np.concatenate((self._posting_doc_tfs, np.asarray(tfs, dtype=np.float32)))
+        doc_lens = np.concatenate((
+            self._doc_lens,
+            np.fromiter((len(tokens) for tokens in token_lists), dtype=np.float64, count=len(token_lists)),
+        ))
+        doc_id_to_row = dict(self._doc_id_to_row)
+        doc_id_to_row.update((doc_id, row) for row, doc_id in enumerate(ids_list, start=first_row))
+        self._refresh_statistics(vocab, posting_terms, posting_doc_rows, posting_doc_tfs, doc_lens)
+        self._doc_id_to_row = doc_id_to_row
+        self._doc_ids = self._doc_ids + ids_list
+
+    def _refresh_statistics(
+        self,
+        vocab: Dict[str, int],
+        posting_terms: np.ndarray,
+        posting_doc_rows: np.ndarray,
+        posting_doc_tfs: np.ndarray,
+        doc_lens: np.ndarray,
+    ) -> None:
+        """Derives the CSC postings, IDF and length norms from the document-order postings.
+
+        Callers hold ``_lock``; the new state is assigned only after it is computed.
+        """
+        order = np.argsort(posting_terms, kind="stable")
+        doc_freqs = np.bincount(posting_terms, minlength=len(vocab))
+        corpus_size = len(doc_lens)
+
+        idf = np.log(corpus_size - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if len(idf):
+            # Same floor as rank_bm25: terms found in more than half the
+            # corpus get epsilon * average IDF instead of a negative weight.
+            idf[idf < 0] = self._epsilon * (sum(idf.tolist()) / len(idf))
+
+        avgdl = float(doc_lens.sum()) / corpus_size if corpus_size else 0.0
+        if avgdl > 0:
+            length_norm = self._k1 * (1 - self._b + self._b * doc_lens / avgdl)
+        else:
+            length_norm = np.full(corpus_size, self._k1 * (1 - self._b))
+
+        postings_indptr = np.concatenate(([0], np.cumsum(doc_freqs))).astype(np.int64)
+        postings_rows = posting_doc_rows[order]
+        # Every posting's contribution depends only on the corpus, so it is
+        # computed here once and a query just gathers and sums them.
+        tfs = posting_doc_tfs[order].astype(np.float64)
+        tf_parts = tfs * (self._k1 + 1) / (tfs + length_norm[postings_rows])
+        if len(postings_rows):
+            max_tf_part = np.maximum.reduceat(tf_parts, postings_indptr[:-1])
+        else:
+            max_tf_part = np.zeros(len(vocab), dtype=np.float64)
+
+        self._posting_terms = posting_terms
+        self._posting_doc_rows = posting_doc_rows
+        self._posting_doc_tfs = posting_doc_tfs
+        self._postings_indptr = postings_indptr
+        self._postings_rows = postings_rows
+        self._postings_scores = np.repeat(idf, doc_freqs) * tf_parts
+        self._idf = idf
+        self._doc_lens = doc_lens
+        self._avgdl = avgdl
+        self._max_tf_part = max_tf_part
+        self._vocab = vocab
+
+    def _sparse_scores(self, query_tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw scores for the documents that contain a query term, as (sorted rows, scores)."""
+        row_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+        for token in query_tokens:
+            term_id = self._vocab.get(token)
+            if term_id is None:
+                continue
+            start = self._postings_indptr[term_id]
+            end = self._postings_indptr[term_id + 1]
+            row_parts.append(self._postings_rows[start:end])
+            score_parts.append(self._postings_scores[start:end])
+        if not row_parts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        all_rows = np.concatenate(row_parts)
+        all_scores = np.concatenate(score_parts)
+        corpus_size = len(self._doc_ids)
+        if len(all_rows) * 8 >= corpus_size:
+            # Common terms: summing into a corpus-sized array is cheaper than
+            # sorting the postings, and adds in the same order.
+            matched = np.flatnonzero(np.bincount(all_rows, minlength=corpus_size))
+            return matched, np.bincount(all_rows, weights=all_scores, minlength=corpus_size)[matched]
+        unique_rows, inverse = np.unique(all_rows, return_inverse=True)
+        return unique_rows, np.bincount(inverse, weights=all_scores)
+
+    def _max_score_candidates(self, query_tokens: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Like ``_sparse_scores`` but skips documents that cannot reach the top ``k``.
+
+        MaxScore: the partial scores of the strongest term give a lower bound
+        on the k-th best score. The weakest terms whose combined upper bound
+        stays below it cannot lift a document into the top ``k`` on their
+        own, so only documents matching a stronger term are scored. Those are
+        scored in full, in query order, so their scores equal the exhaustive ones.
+        """
+        weights = Counter(self._vocab[token] for token in query_tokens if token in self._vocab)
+        if len(weights) < 2 or any(self._idf[term_id] < 0 for term_id in weights):
+            return self._sparse_scores(query_tokens)
+
+        bounds = {
+            term_id: weight * self._idf[term_id] * self._max_tf_part[term_id]
+            for term_id, weight in weights.items()
+        }
+        terms = sorted(weights, key=bounds.__getitem__, reverse=True)
+        start, end = self._postings_indptr[terms[0]], self._postings_indptr[terms[0] + 1]
+        if end - start < k:
+            return self._sparse_scores(query_tokens)
+        first_scores = weights[terms[0]] * self._postings_scores[start:end]
+        # Margin keeps rounding in the bound from pruning an exact tie
+        threshold = float(np.partition(first_scores, -k)[-k]) * (1 - 1e-9)
+
+        essential = len(terms)
+        remaining = 0.0
+        while essential > 1 and remaining + bounds[terms[essential - 1]] < threshold:
+            remaining += bounds[terms[essential - 1]]
+            essential -= 1
+        if essential == len(terms):
+            return self._sparse_scores(query_tokens)
+
+        essential_rows = [
+            self._postings_rows[self._postings_indptr[term_id]:self._postings_indptr[term_id + 1]]
+            for term_id in terms[:essential]
+        ]
+        # A single posting list is already sorted and unique
+        candidate_rows = essential_rows[0] if essential == 1 else np.unique(np.concatenate(essential_rows))
+        return candidate_rows, self._scores_for_rows(query_tokens, candidate_rows)
+
+    def _scores_for_rows(self, query_tokens: Sequence[str], rows: np.ndarray) -> np.ndarray:
+        """Raw scores for the given rows, looked up in each query term's sorted postings.
+
+        Terms are accumulated in query order, so the result matches ``_sparse_scores``.
+        Rows outside the corpus (e.g. -1) score 0.
+        """
+        scores = np.zeros(len(rows), dtype=np.float64)
+        for token in query_tokens:
+            term_id = self._vocab.get(token)
+            if term_id is None:
+                continue
+            positions, hits = self._term_hits(term_id, rows)
+            scores[hits] += self._postings_scores[self._postings_indptr[term_id]:][positions[hits]]
+        return scores
+
+    def _term_hits(self, term_id: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of ``rows`` in the term's sorted postings, and which of them are present."""
+        term_rows = self._postings_rows[self._postings_indptr[term_id]:self._postings_indptr[term_id + 1]]
+        positions = np.searchsorted(term_rows, rows)
+        positions[positions >= len(term_rows)] = 0
+        return positions, term_rows[positions] == rows
+
+    def _score_array(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """Raw BM25 scores for every document in the corpus."""
+        scores = np.zeros(len(self._doc_ids), dtype=np.float64)
+        rows, raw_scores = self._sparse_scores(query_tokens)
+        scores[rows] = raw_scores
+        return scores
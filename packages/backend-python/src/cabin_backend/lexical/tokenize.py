@@ -0,0 +1,127 @@
+"""Lexical tokenization helpers shared by query-time and index-build code."""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AbstractSet, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Below this many texts, worker start-up costs more than it saves.
+PARALLEL_MIN_TEXTS = 5000
+
+_worker_pattern: Optional[re.Pattern[str]] = None
+_worker_stopwords: AbstractSet[str] = frozenset()
+
+# Minimum token length of every pattern built by token_pattern(); other
+# patterns always go through the regex engine.
+_pattern_min_lengths: Dict[re.Pattern[str], int] = {}
+
+# For ASCII text the pattern's runs of [\w'-] are exactly what is left after
+# blanking every other character, so one translate() and split() replace
+# the regex scan.
+_ASCII_SEPARATORS = str.maketrans({
+    chr(code): " " for code in range(128) if not (chr(code).isalnum() or chr(code) in "_'-")
+})
+
+
+@lru_cache(maxsize=8)
+def token_pattern(min_token_length: int) -> re.Pattern[str]:
+    """Compiled token regex for a minimum length, shared by every caller.
+
+    The minimum length is part of the pattern so short tokens never reach
+    Python; greedy backtracking still trims trailing ' and -.
+    """
+    min_length = max(1, min_token_length)
+    pattern = re.compile(r"\b[\w'-]{%d,}\b" % min_length)
+    _pattern_min_lengths[pattern] = min_length
+    return pattern
+
+
+def tokenize_parts(parts: Iterable[str], pattern: re.Pattern[str], stopwords: AbstractSet[str]) -> List[str]:
+    """Tokenizes several text fragments as if they had been joined by whitespace."""
+    findall = pattern.findall
+    min_length = _pattern_min_lengths.get(pattern)
+    tokens: List[str] = []
+    for part in parts:
+        if not part:
+            continue
+        part = part.lower()
+        if min_length is not None and part.isascii():
+            tokens.extend(_ascii_tokens(part, min_length, stopwords))
+        else:
+            tokens.extend([
+                token for token in findall(part) if token not in stopwords and not token.isdigit()
+            ])
+    return tokens
+
+
+def _ascii_tokens(text: str, min_length: int, stopwords: AbstractSet[str]) -> List[str]:
+    """Same tokens as filtering ``token_pattern(min_length).findall(text)`` for ASCII text.
+
+    The \\b anchors drop leading and trailing ' and - from each run, which
+    strip() does here; length, stopword and digit checks share the one pass.
+    """
+    return [
+        token
+        for run in text.translate(_ASCII_SEPARATORS).split()
+        if len(token := run.strip("'-")) >= min_length
+        and token not in stopwords
+        and not token.isdigit()
+    ]
+
+
+@lru_cache(maxsize=4096)
+def tokenize_cached(text: str, pattern: re.Pattern[str], stopwords: frozenset[str]) -> Tuple[str, ...]:
+    """Memoised ``tokenize_parts`` for short texts that recur, such as queries."""
+    return tuple(tokenize_parts((text,), pattern, stopwords))
+
+
+def tokenize_many(
+    parts_list: Sequence[Sequence[str]],
+    pattern: re.Pattern[str],
+    stopwords: AbstractSet[str],
+    *,
+    max_workers: Optional[int] = None,
+    chunksize: int = 256,
+) -> List[List[str]]:
+    """Tokenizes many texts, spreading large batches over worker processes.
+
+    Results are returned in input order. Small batches, single-core hosts and
+    any failure to start the pool fall back to tokenizing in-process.
+    """
+    workers = max_workers or min(os.cpu_count() or 1, 8)
+    if len(parts_list) < PARALLEL_MIN_TEXTS or workers <= 1:
+        return [tokenize_parts(parts, pattern, stopwords) for parts in parts_list]
+
+    try:
+        # spawn rather than fork: the server process runs threads (HTTP
+        # clients, executors) that must not be duplicated into children.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(pattern, _pattern_min_lengths.get(pattern), frozenset(stopwords)),
+        ) as pool:
+            return list(pool.map(_tokenize_in_worker, parts_list, chunksize=chunksize))
+    except Exception as exc:
+        logger.warning("Parallel tokenization failed, falling back to a single process: %s", exc)
+        return [tokenize_parts(parts, pattern, stopwords) for parts in parts_list]
+
+
+def _init_worker(pattern: re.Pattern[str], min_length: Optional[int], stopwords: AbstractSet[str]) -> None:
+    global _worker_pattern, _worker_stopwords
+    _worker_pattern = pattern
+    if min_length is not None:
+        _pattern_min_lengths[pattern] = min_length
+    _worker_stopwords = stopwords
+
+
+def _tokenize_in_worker(parts: Sequence[str]) -> List[str]:
+    return tokenize_parts(parts, _worker_pattern, _worker_stopwords)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import time
@@ -34,7 +35,7 @@ from .data_sources.confluence import ConfluenceDataSource  # Import to register
 from .data_sources.file_upload import FileUploadDataSource  # Import to register
 from .data_sources.url_ingestion import URLIngestionDataSource  # Import to register
 from .config import settings
-from .vllm_metrics import get_vllm_metrics, check_vllm_health
+from .vllm_metrics import get_vllm_metrics, check_vllm_health, close_vllm_metrics
 from .runtime import RuntimeOverrides
 from .telemetry import setup_logging, metrics
 
@@ -346,6 +347,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def close_http_sessions() -> None:
+    await close_vllm_metrics()
+
+
+@app.on_event("shutdown")
+async def persist_lexical_index() -> None:
+    # Incremental ingests discard the saved BM25 index; write the extended one
+    if vector_store_service:
+        await asyncio.to_thread(vector_store_service.save_lexical_index)
+
+
 # --- Service Initialization ---
 try:
     chunker_service = SemanticChunker()
@@ -1712,14 +1726,8 @@ def delete_documents(request: DeleteDocumentsRequest) -> dict:
         raise HTTPException(status_code=503, detail="Vector store not available.")
 
     try:
-        deleted_count = 0
-        for document_id in request.document_ids:
-            try:
-                vector_store_service.delete_document(document_id)
-                deleted_count += 1
-            except Exception as e:
-                print(f"Error deleting document {document_id}: {e}")
-                # Continue with other documents even if one fails
+        # One bulk delete per batch of ids; failed batches are logged and skipped
+        deleted_count = vector_store_service.delete_documents(request.document_ids)
 
         return {
             "success": True,
@@ -2318,41 +2326,40 @@ async def get_vllm_health_status() -> dict:
 @app.get("/api/performance/vllm/debug/{service_name}")
 async def debug_vllm_metrics(service_name: str) -> dict:
     """Debug endpoint to show raw vLLM metrics for troubleshooting."""
-    from .vllm_metrics import VLLMMetricsCollector
+    from .vllm_metrics import metrics_collector as collector
 
     try:
-        async with VLLMMetricsCollector() as collector:
-            base_url = collector.services.get(service_name)
-            if not base_url:
-                return {"error": f"Service {service_name} not configured"}
-
-            import aiohttp
-            async with collector.session.get(f"{base_url}/metrics") as response:
-                if response.status != 200:
-                    return {"error": f"HTTP {response.status}"}
-
-                raw_metrics = await response.text()
-
-                # Parse metrics
-                parsed_metrics = collector._parse_prometheus_metrics(raw_metrics, service_name)
-
-                # Return both raw and parsed for debugging
-                return {
-                    "service": service_name,
-                    "base_url": base_url,
-                    "parsed_metrics": {
-                        "num_requests_running": parsed_metrics.num_requests_running,
-                        "num_requests_waiting": parsed_metrics.num_requests_waiting,
-                        "time_to_first_token_seconds": parsed_metrics.time_to_first_token_seconds,
-                        "time_per_output_token_seconds": parsed_metrics.time_per_output_token_seconds,
-                        "e2e_request_latency_seconds": parsed_metrics.e2e_request_latency_seconds,
-                        "prompt_tokens_total": parsed_metrics.prompt_tokens_total,
-                        "generation_tokens_total": parsed_metrics.generation_tokens_total,
-                        "tokens_per_second": parsed_metrics.tokens_per_second,
-                        "gpu_cache_usage_perc": parsed_metrics.gpu_cache_usage_perc,
-                    },
-                    "raw_vllm_lines": [line for line in raw_metrics.split('\n') if 'vllm:' in line][:20]  # First 20 vLLM lines
-                }
+        base_url = collector.services.get(service_name)
+        if not base_url:
+            return {"error": f"Service {service_name} not configured"}
+
+        session = await collector.get_session()
+        async with session.get(f"{base_url}/metrics") as response:
+            if response.status != 200:
+                return {"error": f"HTTP {response.status}"}
+
+            raw_metrics = await response.text()
+
+            # Parse metrics
+            parsed_metrics = collector._parse_prometheus_metrics(raw_metrics, service_name)
+
+            # Return both raw and parsed for debugging
+            return {
+                "service": service_name,
+                "base_url": base_url,
+                "parsed_metrics": {
+                    "num_requests_running": parsed_metrics.num_requests_running,
+                    "num_requests_waiting": parsed_metrics.num_requests_waiting,
+                    "time_to_first_token_seconds": parsed_metrics.time_to_first_token_seconds,
+                    "time_per_output_token_seconds": parsed_metrics.time_per_output_token_seconds,
+                    "e2e_request_latency_seconds": parsed_metrics.e2e_request_latency_seconds,
+                    "prompt_tokens_total": parsed_metrics.prompt_tokens_total,
+                    "generation_tokens_total": parsed_metrics.generation_tokens_total,
+                    "tokens_per_second": parsed_metrics.tokens_per_second,
+                    "gpu_cache_usage_perc": parsed_metrics.gpu_cache_usage_perc,
+                },
+                "raw_vllm_lines": [line for line in raw_metrics.split('\n') if 'vllm:' in line][:20]  # First 20 vLLM lines
+            }
     except Exception as e:
         return {"error": str(e)}
 
@@ -1,11 +1,12 @@
 """Retriever orchestration utilities."""
 
 from .fusion import reciprocal_rank_fusion, max_marginal_relevance
-from .hygiene import filter_by_cosine_floor, filter_by_keyword_overlap
+from .hygiene import filter_by_cosine_floor, filter_by_keyword_overlap, keyword_overlap_mask
 
 __all__ = [
     "reciprocal_rank_fusion",
     "max_marginal_relevance",
     "filter_by_cosine_floor",
     "filter_by_keyword_overlap",
+    "keyword_overlap_mask",
 ]
@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 
 def reciprocal_rank_fusion(
@@ -22,36 +24,42 @@ def reciprocal_rank_fusion(
 def max_marginal_relevance(
     *,
     candidates: List[Tuple[str, float]],
-    similarity_matrix: Dict[Tuple[str, str], float],
+    similarity: Optional[np.ndarray],
     lambda_param: float,
     limit: int,
 ) -> List[str]:
-    """Performs Max Marginal Relevance diversification over candidates."""
-    if not candidates:
+    """Performs Max Marginal Relevance diversification over candidates.
+
+    ``similarity`` is an (n, n) matrix aligned with ``candidates``, such as the
+    cosine similarity of their embeddings; without it this is a plain top-k by
+    score. Relevance is scaled by the largest absolute score so it is on the
+    same scale as the similarities.
+    """
+    if not candidates or limit <= 0:
         return []
 
+    ids = [item_id for item_id, _ in candidates]
+    relevance = np.fromiter((score for _, score in candidates), dtype=np.float64, count=len(ids))
+    scale = float(np.abs(relevance).max())
+    if scale > 0:
+        relevance /= scale
+
+    if similarity is None:
+        # Stable sort keeps the first of equal scores, as the greedy loop would
+        order = np.argsort(-relevance, kind="stable")[:limit]
+        return [ids[row] for row in order.tolist()]
+
+    base = lambda_param * relevance
+    # Highest similarity of each candidate to anything selected so far
+    diversity = np.zeros(len(ids), dtype=np.float64)
+    available = np.ones(len(ids), dtype=bool)
     selected: List[str] = []
-    candidate_scores = {item_id: score for item_id, score in candidates}
-
-    while len(selected) < limit and candidate_scores:
-        next_item = None
-        best_score = float("-inf")
-
-        for item_id, relevance in candidate_scores.items():
-            diversity = 0.0
-            if selected:
-                diversity = max(
-                    similarity_matrix.get((item_id, prev), 0.0) for prev in selected
-                )
-            mmr_score = lambda_param * relevance - (1 - lambda_param) * diversity
-            if mmr_score > best_score:
-                best_score = mmr_score
-                next_item = item_id
-
-        if next_item is None:
-            break
-
-        selected.append(next_item)
-        candidate_scores.pop(next_item)
+    for _ in range(min(limit, len(ids))):
+        mmr_scores = np.where(available, base - (1 - lambda_param) * diversity, -np.inf)
+        best = int(np.argmax(mmr_scores))
+        column = similarity[:, best]
+        diversity = column.astype(np.float64) if not selected else np.maximum(diversity, column)
+        selected.append(ids[best])
+        available[best] = False
 
     return selected
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
 
 
 def filter_by_cosine_floor(
@@ -27,3 +29,22 @@ def filter_by_keyword_overlap(
         if overlap >= min_overlap or (content_type and content_type in permissive):
             selected.append(item_id)
     return selected
+
+
+def keyword_overlap_mask(
+    overlaps: np.ndarray,
+    content_types: Sequence[Optional[str]],
+    *,
+    min_overlap: int,
+    content_types_permissive: Iterable[str] = (),
+) -> np.ndarray:
+    """Array form of ``filter_by_keyword_overlap``: True where a candidate passes."""
+    permissive = set(content_types_permissive)
+    passing = np.asarray(overlaps) >= min_overlap
+    if permissive:
+        passing |= np.fromiter(
+            (bool(content_type) and content_type in permissive for content_type in content_types),
+            dtype=bool,
+            count=len(content_types),
+        )
+    return passing
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlsplit, urlunsplit
 
@@ -25,6 +29,13 @@ class RerankerClient:
         self._candidate_urls = self._build_url_candidates()
         api_key = settings.app_config.reranker.api_key or os.getenv("RERANKER_API_KEY")
         self._headers = {"X-API-Key": api_key} if api_key else None
+        # LRU of service responses keyed by a digest of the query and candidates.
+        # Heuristic fallbacks are never cached, so a recovered service is used at once.
+        self._cache: "OrderedDict[bytes, Tuple[List[Tuple[str, float]], float]]" = OrderedDict()
+        self._cache_ttl = settings.app_config.reranker.cache_ttl_s
+        self._cache_max_items = settings.app_config.reranker.cache_max_items
+        # rerank() runs on concurrent worker threads
+        self._cache_lock = threading.Lock()
 
     def rerank(
         self,
@@ -38,6 +49,11 @@ class RerankerClient:
             metrics.increment("retrieval.reranker.skipped")
             return []
 
+        cache_key = self._cache_key(query, candidates)
+        cached = self._cached_results(cache_key)
+        if cached is not None:
+            return cached
+
         last_error: Exception | None = None
         for index, url in enumerate(self._candidate_urls, start=1):
             try:
@@ -83,6 +99,7 @@ class RerankerClient:
                     len(results),
                 )
                 metrics.increment("retrieval.reranker.success", len(results))
+                self._remember_results(cache_key, results)
                 return results
             except Exception as exc:  # pragma: no cover - network path
                 last_error = exc
@@ -103,6 +120,38 @@ class RerankerClient:
         metrics.increment("retrieval.reranker.fallback", len(fallback))
         return fallback
 
+    @staticmethod
+    def _cache_key(query: str, candidates: Dict[str, str]) -> bytes:
+        # Texts are part of the key so re-ingested chunks are not served stale scores
+        digest = hashlib.blake2b(query.encode("utf-8"), digest_size=16)
+        for cid, text in candidates.items():
+            digest.update(b"\0" + cid.encode("utf-8") + b"\0" + text.encode("utf-8"))
+        return digest.digest()
+
+    def _cached_results(self, key: bytes) -> Optional[List[Tuple[str, float]]]:
+        if self._cache_max_items <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            results, stored_at = entry
+            if self._cache_ttl and time.monotonic() - stored_at > self._cache_ttl:
+                self._cache.pop(key, None)
+                return None
+            self._cache.move_to_end(key)
+        metrics.increment("retrieval.reranker.cache_hit")
+        return list(results)
+
+    def _remember_results(self, key: bytes, results: List[Tuple[str, float]]) -> None:
+        if self._cache_max_items <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = (list(results), time.monotonic())
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._cache_max_items:
+                self._cache.popitem(last=False)
+
     def _build_url_candidates(self) -> List[str]:
         """Build an ordered list of URLs to attempt for reranking."""
 
@@ -1,18 +1,25 @@
 import asyncio
+import hashlib
 import json
 import logging
-import re
-from typing import Any, Dict, List, Optional, NamedTuple
-
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, NamedTuple, Sequence, Tuple
+
+import numpy as np
 from stopwordsiso import stopwords
 
 from .config import settings
 from .models import ChildChunk, ParentChunk, DocumentMetadata
-from .dense import ChromaCollectionManager, EmbeddingClient
+from .dense import ChromaCollectionManager, EmbeddingClient, PersistentEmbeddingCache
 from .lexical import BM25Index
+from .lexical.tokenize import token_pattern, tokenize_cached, tokenize_many, tokenize_parts
 from .retriever import (
-    filter_by_cosine_floor,
-    filter_by_keyword_overlap,
+    keyword_overlap_mask,
     max_marginal_relevance,
     reciprocal_rank_fusion,
 )
@@ -22,6 +29,80 @@ from .telemetry import metrics, sanitize_text
 
 logger = logging.getLogger(__name__)
 
+# Vectors are handed to Chroma as half precision; recall loss at 256-1024 dims is negligible.
+_EMBEDDING_DTYPE = np.float16
+# Document ids per `$in` filter when deleting; keeps the where clause bounded.
+_MAX_DELETE_BATCH = 1000
+# Runs BM25 index preparation and the collection count while a synchronous
+# query waits on embedding and Chroma I/O
+_QUERY_PREP_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-store-prep")
+
+
+def _score_row(values: List[Optional[float]], count: int) -> np.ndarray:
+    """First ``count`` entries of a Chroma score row as floats, with missing entries as NaN."""
+    head = np.asarray(values[:count], dtype=np.float64)
+    if len(head) == count:
+        # The usual case: Chroma returns one score per hit
+        return head
+    row = np.full(count, np.nan, dtype=np.float64)
+    row[: len(head)] = head
+    return row
+
+
+@lru_cache(maxsize=4096)
+def _split_headings(joined: str) -> Tuple[str, ...]:
+    """Splits Chroma's ' | '-joined headings; many hits share the same parent headings."""
+    return tuple(joined.split(' | ')) if joined else ()
+
+
+@lru_cache(maxsize=4096)
+def _load_headings_json(encoded: str) -> Tuple[str, ...]:
+    """Decodes the exact heading list written alongside the joined form at ingest."""
+    return tuple(json.loads(encoded))
+
+
+class _Candidate:
+    """One parent chunk during a single query.
+
+    A query builds one per unique parent; slots keep them small. Its scores
+    live in parallel arrays in VectorStore._rank_results, indexed by the
+    candidate's position.
+    """
+
+    __slots__ = (
+        "candidate_id",
+        "parent_text",
+        "document_id",
+        "parent_chunk_id",
+        "chunk_identifier",
+        "metadata",
+        "hit_index",
+        "chunk",
+    )
+
+    def __init__(
+        self,
+        *,
+        parent_text: str,
+        document_id: Any,
+        parent_chunk_id: Any,
+        chunk_identifier: Any,
+        metadata: Dict[str, Any],
+        hit_index: int,
+    ) -> None:
+        self.candidate_id = metadata.get("chunk_id") or chunk_identifier
+        self.parent_text = parent_text
+        self.document_id = document_id
+        self.parent_chunk_id = parent_chunk_id
+        self.chunk_identifier = chunk_identifier
+        self.metadata = metadata
+        # Row of the winning child hit in the Chroma query result
+        self.hit_index = hit_index
+        # ParentChunk construction is deferred until the candidate survives
+        # filtering; see VectorStore._parent_chunk_for.
+        self.chunk: Optional[ParentChunk] = None
+
+
 class RoutingContext(NamedTuple):
     documents: List[str]
     strategy: str
@@ -43,15 +124,30 @@ class VectorStore:
 
         reranker_url = overrides.reranker_url or settings.app_config.reranker.url
 
+        embedding_batch_size = max(1, getattr(settings, "embedding_batch_size", 16))
         self.embedding_client = EmbeddingClient(
             api_key=settings.embedding_api_key,
             base_url=embedding_base,
             model=embedding_model,
             dimensions=settings.embedding_dimensions,
-            batch_size=getattr(settings, "embedding_batch_size", 16),
+            batch_size=embedding_batch_size,
+            max_concurrency=settings.embedding_concurrency,
+            coalesce_window_ms=settings.embedding_coalesce_window_ms,
+            max_retries=settings.embedding_max_retries,
             cache_enabled=cache_cfg.enabled,
             cache_max_items=cache_cfg.max_items,
             cache_ttl_seconds=cache_cfg.ttl_seconds,
+            persistent_cache=(
+                PersistentEmbeddingCache(cache_cfg.persistent_path)
+                if cache_cfg.enabled and cache_cfg.persistent_path
+                else None
+            ),
+        )
+        # Whole embedding requests per write batch (48 rather than 50 for a batch
+        # size of 16), so no write ends in a part-filled request
+        max_write_batch = max(1, settings.app_config.ingestion.write_batch_size)
+        self._write_batch_size = (
+            max_write_batch // embedding_batch_size * embedding_batch_size or max_write_batch
         )
 
         # Initialize managed Chroma collection
@@ -59,104 +155,347 @@ class VectorStore:
             host=chroma_host,
             port=chroma_port,
             collection_name=settings.child_collection_name,
+            hnsw_config={
+                "batch_size": settings.chroma_hnsw_batch_size,
+                "sync_threshold": settings.chroma_hnsw_sync_threshold,
+                "ef_construction": settings.chroma_hnsw_ef_construction,
+                "max_neighbors": settings.chroma_hnsw_max_neighbors,
+                "ef_search": settings.chroma_hnsw_ef_search,
+            },
         )
-        self._token_pattern = re.compile(r"\b[\w'-]+\b")
         self._stopwords = self._load_stopwords(settings.stopwords_language)
         self._min_token_length = settings.min_token_length
+        self._token_pattern = token_pattern(self._min_token_length)
+        # Stored lexical tokens are only trusted when written by the same tokenizer setup
+        self._lexical_tokenizer_id = f"{settings.stopwords_language}:{max(1, self._min_token_length)}"
         self.bm25_index = BM25Index(
             language_stopwords=self._stopwords,
             min_token_length=self._min_token_length,
         )
         self.reranker = RerankerClient(base_url=reranker_url)
-        self._last_lexical_rankings: List[Dict[str, Any]] = []
+        # (query tokens, k, candidates by id) from the last query; the corpus-wide
+        # lexical ranking is only computed if someone reads it
+        self._last_lexical_query: Optional[Tuple[List[str], int, Dict[str, _Candidate]]] = None
         # Cache for recent query results to avoid duplicate expensive operations
         self._query_cache: Dict[str, Dict[str, Any]] = {}
         self._query_cache_ttl = 30  # seconds
         # BM25 index needs to be kept in sync with ChromaDB
         self._bm25_needs_rebuild = True
+        self._lexical_index_path = settings.app_config.retrieval.lexical_index_path
+        # The saved index is only tried for the first build; later rebuilds follow local changes
+        self._lexical_index_load_pending = bool(self._lexical_index_path)
+        # Collection chunk ids the in-memory index was built or extended from,
+        # used to fingerprint it on save; None while that is unknown
+        self._lexical_index_chunk_ids: Optional[List[str]] = None
         self._bm25_corpus_cache: List[Dict[str, Any]] = []
+        # Routing context per (query, sample size); dropped whenever the corpus changes
+        self._routing_cache: Dict[Tuple[str, int], Tuple[RoutingContext, float]] = {}
+        self._routing_cache_ttl = 90  # seconds
+        self._routing_cache_max_items = 1024
+        # Routing runs on the event loop (chat) and in the threadpool (chat_stream)
+        self._routing_cache_lock = threading.Lock()
+        # Terms of hits missing from the BM25 index, keyed by (chunk id, text hash)
+        self._candidate_terms_cache: "OrderedDict[Tuple[str, int], frozenset[str]]" = OrderedDict()
+        self._candidate_terms_cache_max_items = 4096
+        # _rank_results runs on worker threads, several at a time
+        self._candidate_terms_cache_lock = threading.Lock()
+        # Query vectors keyed by normalised text, so repeats that differ only in
+        # case or whitespace skip the embedding round trip
+        self._query_embedding_cache_enabled = cache_cfg.enabled
+        self._query_embedding_cache: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._query_embedding_cache_ttl = cache_cfg.ttl_seconds
+        self._query_embedding_cache_max_items = cache_cfg.max_items
+        # query() runs in the threadpool alongside query_async on the event loop
+        self._query_embedding_cache_lock = threading.Lock()
+        # Collection size used to clamp n_results; refreshed after local writes or
+        # once the TTL lapses, so queries usually skip the count round trip
+        self._collection_count: Optional[int] = None
+        self._collection_count_at = 0.0
+        self._collection_count_ttl = 30.0  # seconds
+        # Number of embed+write batches kept in flight by add_documents_async
+        self._ingest_concurrency = 4
 
 
     def delete_document(self, document_id: str) -> None:
         """Remove all chunks associated with a document_id from the store."""
-        if not document_id:
-            return
-        try:
-            self.chroma.collection.delete(where={"document_id": document_id})
+        self.delete_documents([document_id])
+
+    async def delete_document_async(self, document_id: str) -> None:
+        """Async version of delete_document for callers running on the event loop."""
+        await self.delete_documents_async([document_id])
+
+    def delete_documents(self, document_ids: Sequence[str]) -> int:
+        """Remove the chunks of several documents with one `$in` delete per batch.
+
+        Returns how many of the given document ids were covered by a successful delete.
+        """
+        deleted = 0
+        for batch in self._delete_batches(document_ids):
+            try:
+                self.chroma.collection.delete(where=self._document_filter(batch))
+                deleted += len(batch)
+            except Exception as exc:
+                logger.warning("Failed to delete %d documents from Chroma: %s", len(batch), exc)
+        if deleted:
             # Mark BM25 index for rebuild after deletion
-            self._bm25_needs_rebuild = True
-            logger.debug("Marked BM25 index for rebuild after deleting document %s", document_id)
-        except Exception as exc:
-            logger.warning("Failed to delete document %s from Chroma: %s", document_id, exc)
+            self._mark_corpus_changed()
+            logger.debug("Marked BM25 index for rebuild after deleting %d documents", deleted)
+        return deleted
+
+    async def delete_documents_async(self, document_ids: Sequence[str]) -> int:
+        """Async version of delete_documents for callers running on the event loop."""
+        deleted = 0
+        for batch in self._delete_batches(document_ids):
+            try:
+                await self.chroma.delete_async(where=self._document_filter(batch))
+                deleted += len(batch)
+            except Exception as exc:
+                logger.warning("Failed to delete %d documents from Chroma: %s", len(batch), exc)
+        if deleted:
+            self._mark_corpus_changed()
+            logger.debug("Marked BM25 index for rebuild after deleting %d documents", deleted)
+        return deleted
+
+    @staticmethod
+    def _delete_batches(document_ids: Sequence[str]) -> List[List[str]]:
+        # Drop blanks and repeats; Chroma rejects an empty `$in` list
+        unique_ids = list(dict.fromkeys(doc_id for doc_id in document_ids if doc_id))
+        return [
+            unique_ids[start:start + _MAX_DELETE_BATCH]
+            for start in range(0, len(unique_ids), _MAX_DELETE_BATCH)
+        ]
+
+    @staticmethod
+    def _document_filter(document_ids: List[str]) -> Dict[str, Any]:
+        if len(document_ids) == 1:
+            return {"document_id": document_ids[0]}
+        return {"document_id": {"$in": document_ids}}
 
     def add_documents(self, chunks: List[ChildChunk]):
         """Embeds and stores a list of ChildChunks in ChromaDB."""
         if not chunks:
             return
 
-        # Process chunks in smaller batches to avoid ChromaDB payload size limits
-        batch_size = 50  # Reduced batch size to prevent 413 Payload Too Large errors
-
-        for i in range(0, len(chunks), batch_size):
-            batch_chunks = chunks[i:i + batch_size]
-            logger.info(f"Processing batch {i // batch_size + 1}/{(len(chunks) + batch_size - 1) // batch_size} ({len(batch_chunks)} chunks)")
-
-            ids = [chunk.id for chunk in batch_chunks]
-            documents = [chunk.text for chunk in batch_chunks]  # Store original text
-            metadatas = []
-            embedding_texts = []  # Metadata-enriched text for embeddings
-
-            for chunk in batch_chunks:
-                metadata = (
-                    chunk.metadata.model_dump()
-                    if hasattr(chunk.metadata, "model_dump")
-                    else chunk.metadata.dict()
+        batches = self._batch_chunks(chunks)
+        written: List[Tuple[str, str, Dict[str, Any]]] = []
+        # Embed the next batch while the current one is written to Chroma
+        try:
+            with ThreadPoolExecutor(max_workers=1) as prefetch:
+                pending = prefetch.submit(self._prepare_and_embed, batches[0])
+                for index, batch_chunks in enumerate(batches, start=1):
+                    logger.info(f"Processing batch {index}/{len(batches)} ({len(batch_chunks)} chunks)")
+                    ids, documents, metadatas, embeddings = pending.result()
+                    if index < len(batches):
+                        pending = prefetch.submit(self._prepare_and_embed, batches[index])
+                    written_rows = self._write_batch(batch_chunks, ids, embeddings, documents, metadatas)
+                    written.extend((ids[row], documents[row], metadatas[row]) for row in written_rows)
+        except BaseException:
+            # Earlier batches are already in Chroma; rebuild BM25 so they stay searchable
+            self._mark_corpus_changed()
+            raise
+
+        self._index_added_documents(written)
+
+    def _prepare_and_embed(
+        self, batch_chunks: List[ChildChunk]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]:
+        ids, documents, metadatas, embedding_texts = self._prepare_batch(batch_chunks)
+        # Generate embeddings from metadata-enriched text
+        # Store original text in ChromaDB, but use enriched text for embeddings
+        return ids, documents, metadatas, self._get_embeddings(embedding_texts)
+
+    async def add_documents_async(self, chunks: List[ChildChunk]) -> None:
+        """
+        Async version of add_documents that keeps several batches in flight, so
+        Chroma writes overlap with embedding-server compute for later batches.
+        """
+        if not chunks:
+            return
+
+        batches = self._batch_chunks(chunks)
+        semaphore = asyncio.Semaphore(self._ingest_concurrency)
+        written: List[Tuple[str, str, Dict[str, Any]]] = []
+
+        async def embed_and_write(index: int, batch_chunks: List[ChildChunk]) -> None:
+            async with semaphore:
+                logger.info(f"Processing batch {index}/{len(batches)} ({len(batch_chunks)} chunks)")
+                ids, documents, metadatas, embedding_texts = self._prepare_batch(batch_chunks)
+                embeddings = np.asarray(
+                    await self.embedding_client.embed_async(embedding_texts),
+                    dtype=_EMBEDDING_DTYPE,
                 )
-                metadata["parent_chunk_text"] = chunk.parent_chunk_text
-                metadatas.append(self._sanitize_metadata(metadata))
+                written_rows = await self._write_batch_async(batch_chunks, ids, embeddings, documents, metadatas)
+                written.extend((ids[row], documents[row], metadatas[row]) for row in written_rows)
+
+        # Every batch runs to completion before an error is raised, so none is
+        # left in flight unawaited
+        outcomes = await asyncio.gather(
+            *(embed_and_write(index, batch) for index, batch in enumerate(batches, start=1)),
+            return_exceptions=True,
+        )
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            # The failed batch may have been partly written, so the BM25 index
+            # is rebuilt from Chroma rather than extended with what is known
+            self._mark_corpus_changed()
+            raise errors[0]
+
+        self._index_added_documents(written)
+
+    def _index_added_documents(self, written: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Extends a built BM25 index with freshly written chunks instead of forcing a rebuild."""
+        self._collection_count = None
+        if self._bm25_needs_rebuild:
+            # Nothing built yet (or already stale); the next rebuild reads everything.
+            self._mark_corpus_changed()
+            return
 
-                # Create metadata-enriched text for better semantic embeddings
-                embedding_text = self._create_embedding_text(chunk.text, metadata)
-                embedding_texts.append(embedding_text)
+        doc_ids: List[str] = []
+        token_lists: List[List[str]] = []
+        for doc_id, text, metadata in written:
+            if not text:
+                continue
+            tokens = self._stored_tokens(metadata)
+            if tokens is None:
+                # Same candidate text as _ensure_bm25_index builds from the stored metadata
+                parent_text = metadata.get('parent_chunk_text', text)
+                tokens = self._tokenize_parts(self._candidate_text_parts(parent_text, metadata))
+            if tokens:
+                doc_ids.append(doc_id)
+                token_lists.append(tokens)
 
-            # Generate embeddings from metadata-enriched text
-            # Store original text in ChromaDB, but use enriched text for embeddings
-            embeddings = self._get_embeddings(embedding_texts)
+        try:
+            self.bm25_index.add_documents(doc_ids, token_lists)
+        except ValueError:
+            # Re-added ids replace existing rows, which needs a full rebuild
+            self._mark_corpus_changed()
+            logger.debug("Marked BM25 index for rebuild after re-adding existing chunks")
+            return
 
-            try:
-                self.chroma.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-                logger.info(f"Successfully added batch of {len(batch_chunks)} chunks")
-            except Exception as e:
-                logger.error(f"Failed to add batch of {len(batch_chunks)} chunks: {e}")
-                # Try with even smaller batch if this one fails
-                if len(batch_chunks) > 1:
-                    logger.info("Retrying with individual chunks...")
-                    for chunk in batch_chunks:
-                        try:
-                            single_metadata = (
-                                chunk.metadata.model_dump()
-                                if hasattr(chunk.metadata, "model_dump")
-                                else chunk.metadata.dict()
-                            )
-                            single_metadata["parent_chunk_text"] = chunk.parent_chunk_text
-                            # Use metadata-enriched text for embeddings
-                            single_embedding_text = self._create_embedding_text(chunk.text, single_metadata)
-                            single_embedding = self._get_embeddings([single_embedding_text])
-                            self.chroma.add(
-                                ids=[chunk.id],
-                                embeddings=single_embedding,
-                                documents=[chunk.text],
-                                metadatas=[self._sanitize_metadata(single_metadata)]
-                            )
-                            logger.info(f"Successfully added individual chunk: {chunk.id}")
-                        except Exception as single_e:
-                            logger.error(f"Failed to add individual chunk {chunk.id}: {single_e}")
-                else:
-                    raise e
+        with self._routing_cache_lock:
+            self._routing_cache.clear()
+        # The saved file no longer matches; save_lexical_index writes the
+        # extended index on shutdown
+        self._discard_saved_lexical_index()
+        if self._lexical_index_chunk_ids is not None:
+            self._lexical_index_chunk_ids = self._lexical_index_chunk_ids + [doc_id for doc_id, _, _ in written]
+        logger.debug("Added %d chunks to the BM25 index incrementally", len(doc_ids))
 
-        # Mark BM25 index for rebuild after adding documents
-        self._bm25_needs_rebuild = True
-        logger.debug("Marked BM25 index for rebuild after adding %d chunks", len(chunks))
+    def _batch_chunks(self, chunks: List[ChildChunk]) -> List[List[ChildChunk]]:
+        # Process chunks in smaller batches to avoid ChromaDB payload size limits
+        batch_size = self._write_batch_size
+        return [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+    def _prepare_batch(
+        self, batch_chunks: List[ChildChunk]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]], List[str]]:
+        """Builds Chroma ids/documents/metadatas plus the enriched texts to embed."""
+        ids = [chunk.id for chunk in batch_chunks]
+        documents = [chunk.text for chunk in batch_chunks]  # Store original text
+        metadatas = []
+        embedding_texts = []  # Metadata-enriched text for embeddings
+        # Sibling chunks share their parent text and page metadata, so their
+        # lexical text is usually identical; tokenize each distinct one once.
+        lexical_tokens_by_parts: Dict[Tuple[str, ...], str] = {}
+
+        for chunk in batch_chunks:
+            # None fields are dropped by pydantic here rather than skipped in _sanitize_metadata
+            metadata = (
+                chunk.metadata.model_dump(exclude_none=True)
+                if hasattr(chunk.metadata, "model_dump")
+                else chunk.metadata.dict(exclude_none=True)
+            )
+            metadata["parent_chunk_text"] = chunk.parent_chunk_text
+            sanitized = self._sanitize_metadata(metadata)
+            headings = [heading for heading in metadata.get("headings") or [] if heading]
+            if headings:
+                # The ' | '-joined form stays for filters and lexical text; this
+                # copy round-trips headings that themselves contain ' | '.
+                sanitized["headings_json"] = json.dumps(headings)
+            # Tokenize the lexical candidate text once here so BM25 rebuilds
+            # and queries can read the tokens back instead of recomputing them.
+            parts = tuple(self._candidate_text_parts(chunk.parent_chunk_text, sanitized))
+            lexical_tokens = lexical_tokens_by_parts.get(parts)
+            if lexical_tokens is None:
+                lexical_tokens = " ".join(self._tokenize_parts(parts))
+                lexical_tokens_by_parts[parts] = lexical_tokens
+            sanitized["lexical_tokens"] = lexical_tokens
+            sanitized["lexical_tokenizer"] = self._lexical_tokenizer_id
+            metadatas.append(sanitized)
+
+            # Create metadata-enriched text for better semantic embeddings
+            embedding_text = self._create_embedding_text(chunk.text, metadata)
+            embedding_texts.append(embedding_text)
+
+        return ids, documents, metadatas, embedding_texts
+
+    def _write_batch(
+        self,
+        batch_chunks: List[ChildChunk],
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> List[int]:
+        """Writes a batch to Chroma and returns the positions of the chunks that were stored."""
+        try:
+            self.chroma.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            logger.info(f"Successfully added batch of {len(batch_chunks)} chunks")
+            return list(range(len(batch_chunks)))
+        except Exception as e:
+            logger.error(f"Failed to add batch of {len(batch_chunks)} chunks: {e}")
+            # Try with even smaller batch if this one fails
+            if len(batch_chunks) > 1:
+                logger.info("Retrying with individual chunks...")
+                written_rows: List[int] = []
+                for row, (chunk, chunk_embedding, metadata) in enumerate(zip(batch_chunks, embeddings, metadatas)):
+                    try:
+                        self.chroma.add(
+                            ids=[chunk.id],
+                            embeddings=[chunk_embedding],
+                            documents=[chunk.text],
+                            metadatas=[metadata]
+                        )
+                        logger.info(f"Successfully added individual chunk: {chunk.id}")
+                        written_rows.append(row)
+                    except Exception as single_e:
+                        logger.error(f"Failed to add individual chunk {chunk.id}: {single_e}")
+                return written_rows
+            else:
+                raise e
+
+    async def _write_batch_async(
+        self,
+        batch_chunks: List[ChildChunk],
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> List[int]:
+        """Async version of _write_batch with the same per-chunk fallback."""
+        try:
+            await self.chroma.add_async(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            logger.info(f"Successfully added batch of {len(batch_chunks)} chunks")
+            return list(range(len(batch_chunks)))
+        except Exception as e:
+            logger.error(f"Failed to add batch of {len(batch_chunks)} chunks: {e}")
+            if len(batch_chunks) <= 1:
+                raise
+            logger.info("Retrying with individual chunks...")
+            written_rows: List[int] = []
+            for row, (chunk, chunk_embedding, metadata) in enumerate(zip(batch_chunks, embeddings, metadatas)):
+                try:
+                    await self.chroma.add_async(
+                        ids=[chunk.id],
+                        embeddings=[chunk_embedding],
+                        documents=[chunk.text],
+                        metadatas=[metadata],
+                    )
+                    logger.info(f"Successfully added individual chunk: {chunk.id}")
+                    written_rows.append(row)
+                except Exception as single_e:
+                    logger.error(f"Failed to add individual chunk {chunk.id}: {single_e}")
+            return written_rows
 
     @staticmethod
     def _sanitize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
@@ -164,11 +503,16 @@ class VectorStore:
         sanitized: Dict[str, Any] = {}
 
         for key, value in metadata.items():
+            # Most metadata values are already primitives, so check those first
+            if isinstance(value, (str, int, float, bool)):
+                sanitized[key] = value
+                continue
+
             if value is None:
                 continue
 
             if isinstance(value, list):
-                joined = " | ".join(str(item) for item in value if item not in (None, ""))
+                joined = " | ".join([str(item) for item in value if item is not None and item != ""])
                 if joined:
                     sanitized[key] = joined
                 continue
@@ -178,10 +522,6 @@ class VectorStore:
                 sanitized[key] = json.dumps(value, sort_keys=True)
                 continue
 
-            if isinstance(value, (str, int, float, bool)):
-                sanitized[key] = value
-                continue
-
             sanitized[key] = str(value)
 
         return sanitized
@@ -196,7 +536,7 @@ class VectorStore:
         allow_reranker_fallback: Optional[bool] = None,
     ) -> List[ParentChunk]:
         """
-        Async version of query with parallel embedding + BM25 index preparation.
+        Async version of query that overlaps Chroma I/O, embedding and BM25 preparation.
         Queries for child chunks and returns the corresponding parent chunks.
         """
         query_preview = sanitize_text(query_text[:64].replace("\n", " "))
@@ -205,24 +545,28 @@ class VectorStore:
         )
         metrics.increment("retrieval.vector_store.calls")
         metrics.increment("retrieval.vector_store.async_calls")
-        self._last_lexical_rankings = []
+        self._last_lexical_query = None
 
         # Create cache key
         cache_key = f"{query_text}:{top_k}:{str(filters)}:{use_reranker}:{allow_reranker_fallback}"
 
         # Check cache first
-        import time
         current_time = time.time()
-        if cache_key in self._query_cache:
-            cached_result = self._query_cache[cache_key]
-            if current_time - cached_result['timestamp'] < self._query_cache_ttl:
-                logger.debug("Using cached query result for: %s", query_preview)
-                metrics.increment("retrieval.vector_store.cache_hit")
-                return cached_result['chunks']
+        cached_chunks = self._get_cached_query(cache_key, current_time)
+        if cached_chunks is not None:
+            logger.debug("Using cached query result for: %s", query_preview)
+            metrics.increment("retrieval.vector_store.cache_hit")
+            return cached_chunks
 
         with metrics.timer("retrieval.vector_store.query_time", query=query_text):
             try:
-                collection_count = self.chroma.count()
+                # PARALLEL OPTIMIZATION: the collection count, query embedding and BM25
+                # index preparation are independent, so run them concurrently.
+                collection_count, query_embedding, _ = await asyncio.gather(
+                    self._get_collection_count_async(),
+                    self._embed_query_async(query_text),
+                    asyncio.to_thread(self._ensure_bm25_index),
+                )
                 if collection_count == 0:
                     logger.warning(
                         "VectorStore empty; no documents indexed (len=%d, preview=%s)",
@@ -232,39 +576,35 @@ class VectorStore:
                     metrics.increment("retrieval.vector_store.empty")
                     return []
 
-                # PARALLEL OPTIMIZATION: Run embedding and BM25 index building concurrently
-                # This saves ~50-100ms by doing both operations at the same time
-                embedding_future = asyncio.create_task(
-                    self.embedding_client.embed_async([query_text])
-                )
-                bm25_future = asyncio.create_task(
-                    asyncio.to_thread(self._ensure_bm25_index)
+                effective_top_k = top_k or self.default_final_passages
+                n_results = min(effective_top_k, collection_count)
+                results = await self.chroma.query_async(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=filters,
                 )
 
-                # Wait for both to complete
-                await asyncio.gather(embedding_future, bm25_future)
-
             except Exception as e:
                 logger.error(
-                    "Failed to prepare async query (len=%d, preview=%s): %s",
+                    "Failed to query ChromaDB async (len=%d, preview=%s): %s",
                     len(query_text),
                     query_preview,
                     e,
                 )
                 metrics.increment("retrieval.vector_store.errors")
+                self._collection_count = None
                 return []
 
-        # Now call the synchronous query method which will use the prepared state
-        # (BM25 index is already built, embedding cache is warmed up)
+        # Ranking is CPU-bound (and the reranker call is blocking), so keep it off the loop.
         result_chunks = await asyncio.to_thread(
-            self.query,
+            self._rank_results,
             query_text,
+            results,
             top_k,
-            filters,
             use_reranker=use_reranker,
-            allow_reranker_fallback=allow_reranker_fallback
+            allow_reranker_fallback=allow_reranker_fallback,
         )
-
+        self._cache_query_result(cache_key, result_chunks, current_time)
         return result_chunks
 
     def query(
@@ -285,25 +625,35 @@ class VectorStore:
             "VectorStore query received (len=%d): %s", len(query_text), query_preview
         )
         metrics.increment("retrieval.vector_store.calls")
-        self._last_lexical_rankings = []
+        self._last_lexical_query = None
 
         # Create cache key based on query and parameters
         cache_key = f"{query_text}:{top_k}:{str(filters)}:{use_reranker}:{allow_reranker_fallback}"
 
         # Check cache first
-        import time
         current_time = time.time()
-        if cache_key in self._query_cache:
-            cached_result = self._query_cache[cache_key]
-            if current_time - cached_result['timestamp'] < self._query_cache_ttl:
-                logger.debug("Using cached query result for: %s", query_preview)
-                metrics.increment("retrieval.vector_store.cache_hit")
-                return cached_result['chunks']
+        cached_chunks = self._get_cached_query(cache_key, current_time)
+        if cached_chunks is not None:
+            logger.debug("Using cached query result for: %s", query_preview)
+            metrics.increment("retrieval.vector_store.cache_hit")
+            return cached_chunks
+
+        # A pending BM25 (re)build is independent of the embedding and ANN round
+        # trips, so overlap them as query_async does
+        bm25_ready = (
+            _QUERY_PREP_POOL.submit(self._ensure_bm25_index) if self._bm25_needs_rebuild else None
+        )
 
         with metrics.timer("retrieval.vector_store.query_time", query=query_text):
             try:
-                # Check if collection has any documents
-                collection_count = self.chroma.count()
+                # Check if collection has any documents. When the count has to be
+                # fetched, do so alongside the query embedding as query_async does.
+                query_embedding = None
+                collection_count = self._fresh_collection_count()
+                if collection_count is None:
+                    count_ready = _QUERY_PREP_POOL.submit(self._get_collection_count)
+                    query_embedding = self._embed_query(query_text)
+                    collection_count = count_ready.result()
                 if collection_count == 0:
                     logger.warning(
                         "VectorStore empty; no documents indexed (len=%d, preview=%s)",
@@ -313,7 +663,8 @@ class VectorStore:
                     metrics.increment("retrieval.vector_store.empty")
                     return []  # Return empty list if no documents indexed
 
-                query_embedding = self._get_embeddings([query_text])[0]
+                if query_embedding is None:
+                    query_embedding = self._embed_query(query_text)
 
                 # Build query parameters
                 effective_top_k = top_k or self.default_final_passages
@@ -332,34 +683,89 @@ class VectorStore:
                     e,
                 )
                 metrics.increment("retrieval.vector_store.errors")
+                self._collection_count = None
                 return []  # Return empty results instead of crashing
 
-        # Process results to get unique parent chunks
-        parent_chunks_map: Dict[str, Dict[str, Any]] = {}
+        if bm25_ready is not None:
+            bm25_ready.result()
+        result_chunks = self._rank_results(
+            query_text,
+            results,
+            top_k,
+            use_reranker=use_reranker,
+            allow_reranker_fallback=allow_reranker_fallback,
+        )
+        self._cache_query_result(cache_key, result_chunks, current_time)
+        return result_chunks
+
+    def _rank_results(
+        self,
+        query_text: str,
+        results: Dict[str, Any],
+        top_k: Optional[int],
+        *,
+        use_reranker: Optional[bool],
+        allow_reranker_fallback: Optional[bool],
+    ) -> List[ParentChunk]:
+        """Turns raw Chroma child hits into ranked, deduplicated parent chunks."""
+        query_preview = sanitize_text(query_text[:64].replace("\n", " "))
+        # Read config once; several of these are otherwise looked up per candidate
+        app_config = settings.app_config
+        retrieval_cfg = app_config.retrieval
+        reranker_cfg = app_config.reranker
+        min_lexical_score = settings.min_lexical_score
 
         retrieved_ids = results['ids'][0]
         retrieved_metadatas = results['metadatas'][0]
-        retrieved_distances = results.get('distances') or []
-        retrieved_similarities = results.get('similarities') or []
+        hit_scores = self._embedding_scores(
+            len(retrieved_metadatas),
+            results.get('distances') or [],
+            results.get('similarities') or [],
+        )
+        embedding_scores = hit_scores.tolist()
 
+        query_tokens = self._tokenize_text(query_text)
+        if query_tokens:
+            # Keyword overlap is read from the index postings, so build it first
+            self._ensure_bm25_index()
+
+        # First pass: pick the best-scoring child hit per parent using only cheap
+        # lookups, so metadata is parsed once per unique parent below.
+        best_hits: Dict[Tuple[str, str], Tuple[int, str, Any, Any, Any]] = {}
         for i, metadata in enumerate(retrieved_metadatas):
-            metadata_copy = dict(metadata)
-            parent_text = metadata_copy.get("parent_chunk_text")
+            parent_text = metadata.get("parent_chunk_text")
             if not parent_text:
                 continue
 
             document_id = (
-                metadata_copy.get("document_id")
-                or metadata_copy.get("source_url")
-                or metadata_copy.get("page_title")
+                metadata.get("document_id")
+                or metadata.get("source_url")
+                or metadata.get("page_title")
             )
-            parent_chunk_id = metadata_copy.get("parent_chunk_id") or metadata_copy.get("chunk_id")
+            parent_chunk_id = metadata.get("parent_chunk_id") or metadata.get("chunk_id")
+            # Chroma ids are never empty, so the identifier alone keys the parent
             chunk_identifier = parent_chunk_id or retrieved_ids[i]
-            key = f"{document_id or ''}::{chunk_identifier or parent_text}"
-
+            key = (document_id or '', chunk_identifier)
+
+            best = best_hits.get(key)
+            if best is None or embedding_scores[i] > embedding_scores[best[0]]:
+                best_hits[key] = (i, parent_text, document_id, parent_chunk_id, chunk_identifier)
+
+        # Second pass: only the surviving hit per parent is parsed and tokenized.
+        # The id, row and lookup containers used by ranking are filled alongside.
+        candidates: List[_Candidate] = []
+        candidate_ids: List[str] = []
+        hit_rows: List[int] = []
+        hit_ids: List[str] = []
+        record_lookup: Dict[str, _Candidate] = {}
+        for i, parent_text, document_id, parent_chunk_id, chunk_identifier in best_hits.values():
+            metadata_copy = dict(retrieved_metadatas[i])
             raw_headings = metadata_copy.get("headings", [])
-            if isinstance(raw_headings, str):
-                headings = raw_headings.split(' | ') if raw_headings else []
+            headings_json = metadata_copy.pop("headings_json", None)
+            if headings_json:
+                headings = list(_load_headings_json(headings_json))
+            elif isinstance(raw_headings, str):
+                headings = list(_split_headings(raw_headings))
             elif isinstance(raw_headings, list):
                 headings = [heading for heading in raw_headings if heading]
             else:
@@ -369,42 +775,21 @@ class VectorStore:
             metadata_copy.setdefault("chunk_id", chunk_identifier)
             metadata_copy.setdefault("document_id", document_id)
 
-            parent_metadata = DocumentMetadata(
-                page_title=metadata_copy.get("page_title", ""),
-                space_name=metadata_copy.get("space_name"),
-                space_key=metadata_copy.get("space_key"),
-                source_url=metadata_copy.get("source_url"),
-                url=metadata_copy.get("url"),
-                headings=headings,
-                last_modified=metadata_copy.get("last_modified"),
+            candidate = _Candidate(
+                parent_text=parent_text,
                 document_id=document_id,
                 parent_chunk_id=parent_chunk_id,
-                chunk_id=chunk_identifier,
-                chunk_type="parent",
-                page_version=metadata_copy.get("page_version"),
-                content_type=metadata_copy.get("content_type"),
-                anchor_id=metadata_copy.get("anchor_id"),
-            )
-            parent_chunk = ParentChunk(
-                id=chunk_identifier,
-                text=parent_text,
-                metadata=parent_metadata
+                chunk_identifier=chunk_identifier,
+                metadata=metadata_copy,
+                hit_index=i,
             )
+            candidates.append(candidate)
+            candidate_ids.append(candidate.candidate_id)
+            hit_rows.append(i)
+            hit_ids.append(retrieved_ids[i])
+            record_lookup[candidate.candidate_id] = candidate
 
-            embedding_score = self._calculate_embedding_score(i, retrieved_distances, retrieved_similarities)
-            candidate_text = self._build_candidate_text(parent_text, metadata_copy)
-            candidate_tokens = self._tokenize_text(candidate_text)
-
-            existing = parent_chunks_map.get(key)
-            if not existing or embedding_score > existing["embedding_score"]:
-                parent_chunks_map[key] = {
-                    "chunk": parent_chunk,
-                    "metadata": metadata_copy,
-                    "embedding_score": embedding_score,
-                    "tokens": candidate_tokens,
-                }
-
-        if not parent_chunks_map:
+        if not candidates:
             logger.warning(
                 "No parent candidates built (len=%d, preview=%s)",
                 len(query_text),
@@ -412,103 +797,74 @@ class VectorStore:
             )
             return []
 
-        candidates = list(parent_chunks_map.values())
-        all_chunk_lookup = {
-            record.get("metadata", {}).get("chunk_id") or record["chunk"].id: record["chunk"]
-            for record in candidates
-        }
-
-        query_tokens = self._tokenize_text(query_text)
-
-        candidate_ids = [
-            candidate.get("metadata", {}).get("chunk_id") or candidate["chunk"].id
-            for candidate in candidates
-        ]
-
-        lexical_scores = self._calculate_lexical_scores(
-            query_tokens,
-            [candidate["tokens"] for candidate in candidates],
-            candidate_ids,
-        )
-
         logger.debug(
             "VectorStore candidates before hygiene for '%s': %d", query_text, len(candidates)
         )
 
-        query_term_set = set(query_tokens)
-
-        for candidate, lexical_score in zip(candidates, lexical_scores):
-            candidate["lexical_score"] = lexical_score
-            candidate["combined_score"] = self._combine_scores(
-                candidate["embedding_score"],
-                lexical_score,
-            )
-            tokens_set = set(candidate["tokens"])
-            candidate["keyword_overlap"] = len(query_term_set & tokens_set) if query_term_set else 0
+        # Per-candidate scores are parallel arrays indexed by position in candidates
+        candidate_embedding_scores = hit_scores[np.array(hit_rows, dtype=np.intp)]
 
         if query_tokens:
-            filtered_candidates = [
-                candidate for candidate in candidates
-                if candidate["lexical_score"] >= settings.min_lexical_score
-            ]
+            lexical_scores = self._calculate_lexical_scores(query_tokens, candidate_ids)
+            # Keyword overlap for indexed hits comes from the query terms' postings;
+            # only hits missing from the index are tokenized here.
+            index_rows = self.bm25_index.rows_for_ids(hit_ids)
+            keyword_overlaps = self.bm25_index.matched_term_counts(query_tokens, index_rows)
+            unindexed_rows = np.flatnonzero(index_rows < 0).tolist()
+            if unindexed_rows:
+                query_term_set = frozenset(query_tokens)
+                for row in unindexed_rows:
+                    keyword_overlaps[row] = len(query_term_set & self._candidate_terms(candidates[row]))
         else:
-            filtered_candidates = candidates
+            # Without query terms every lexical score and keyword overlap is zero,
+            # so BM25 is skipped; fusion and hygiene below still see those zeros.
+            lexical_scores = np.zeros(len(candidates), dtype=np.float64)
+            keyword_overlaps = np.zeros(len(candidates), dtype=np.int64)
 
-        if not filtered_candidates:
-            filtered_candidates = candidates
+        # Positions (into candidates) of those that pass the lexical filter
+        active_rows = np.arange(len(candidates))
+        if query_tokens:
+            passing_rows = np.flatnonzero(lexical_scores >= min_lexical_score)
+            if len(passing_rows):
+                active_rows = passing_rows
 
-        active_candidates = filtered_candidates
+        if len(active_rows) == len(candidates):
+            active_ids = candidate_ids
+            active_lookup = record_lookup
+        else:
+            active_ids = [candidate_ids[row] for row in active_rows.tolist()]
+            active_lookup = {candidate_ids[row]: candidates[row] for row in active_rows.tolist()}
 
-        extracted = [
-            (candidate.get("metadata", {}), candidate["chunk"])
-            for candidate in active_candidates
-        ]
+        def _ranking_ids(scores: np.ndarray) -> List[str]:
+            # Stable, like sorted(reverse=True): equal scores keep candidate order
+            order = active_rows[np.argsort(-scores[active_rows], kind="stable")]
+            return list(dict.fromkeys([candidate_ids[row] for row in order.tolist()]))
 
-        def _ranking_ids(entries: List[Dict[str, Any]], key_name: str) -> List[str]:
-            seen: set[str] = set()
-            ordered: List[str] = []
-            for candidate in sorted(entries, key=lambda item: item.get(key_name, 0.0), reverse=True):
-                chunk_id = candidate.get("metadata", {}).get("chunk_id") or candidate["chunk"].id
-                if chunk_id in seen:
-                    continue
-                seen.add(chunk_id)
-                ordered.append(chunk_id)
-            return ordered
-
-        dense_ranked_ids = _ranking_ids(active_candidates, "embedding_score")
-        lexical_ranked_ids = _ranking_ids(active_candidates, "lexical_score")
+        dense_ranked_ids = _ranking_ids(candidate_embedding_scores)
+        rrf_k = retrieval_cfg.rrf_k
 
+        # All-zero lexical scores (no query terms) rank in candidate order
+        lexical_ranked_ids = _ranking_ids(lexical_scores)
         fusion_scores = reciprocal_rank_fusion(
             [dense_ranked_ids, lexical_ranked_ids],
-            k=settings.app_config.retrieval.rrf_k,
+            k=rrf_k,
         )
 
         # Apply hygiene filters
-        cosine_filtered = filter_by_cosine_floor(
-            fusion_scores,
-            cosine_floor=self.cosine_floor_default,
-        )
-
-        keyword_candidates = {
-            (meta.get("chunk_id") or chunk.id): {
-                "keyword_overlap": candidate.get("keyword_overlap", 0),
-                "content_type": chunk.metadata.content_type,
-            }
-            for candidate, (meta, chunk) in zip(active_candidates, extracted)
-        }
-
-        allowed_ids = set(
-            filter_by_keyword_overlap(
-                candidates=keyword_candidates,
-                min_overlap=self.min_keyword_overlap_default,
-                content_types_permissive=("code", "table"),
-            )
+        keyword_ok = keyword_overlap_mask(
+            keyword_overlaps[active_rows],
+            [candidates[row].metadata.get("content_type") for row in active_rows.tolist()],
+            min_overlap=self.min_keyword_overlap_default,
+            content_types_permissive=("code", "table"),
         )
-
+        # Keyed by id, so a repeated id takes its last row's verdict
+        keyword_allowed = dict(zip(active_ids, keyword_ok.tolist()))
+        cosine_floor = self.cosine_floor_default
+        # Cosine floor and keyword overlap in one pass over the fused scores
         filtered_scores = {
             item_id: score
-            for item_id, score in cosine_filtered.items()
-            if item_id in allowed_ids
+            for item_id, score in fusion_scores.items()
+            if score >= cosine_floor and keyword_allowed.get(item_id, False)
         }
 
         if not filtered_scores:
@@ -519,14 +875,13 @@ class VectorStore:
         early_reranker_enabled = reranker_enabled  # Early reranking is now always enabled when reranking is enabled
         fallback_enabled = self.allow_reranker_fallback_default if allow_reranker_fallback is None else allow_reranker_fallback
 
-        chunk_lookup = {meta.get("chunk_id") or chunk.id: chunk for meta, chunk in extracted}
         final_scores = filtered_scores
 
         if early_reranker_enabled and filtered_scores:
             # Take top candidates for reranking (larger pool than final selection)
             rerank_pool_size = min(
                 len(filtered_scores),
-                settings.app_config.reranker.top_n * settings.app_config.reranker.pool_size_multiplier
+                reranker_cfg.top_n * reranker_cfg.pool_size_multiplier
             )
             top_candidates = sorted(
                 filtered_scores.items(),
@@ -536,9 +891,9 @@ class VectorStore:
 
             # Prepare reranker input
             reranker_input = {
-                cid: chunk_lookup[cid].text
+                cid: active_lookup[cid].parent_text
                 for cid, _ in top_candidates
-                if cid in chunk_lookup
+                if cid in active_lookup
             }
 
             if reranker_input:
@@ -554,16 +909,21 @@ class VectorStore:
 
                     # Create hybrid scores combining fusion and reranker scores
                     hybrid_scores = {}
-                    reranker_weight = settings.app_config.reranker.score_weight
+                    reranker_weight = reranker_cfg.score_weight
                     fusion_weight = 1.0 - reranker_weight
 
                     for cid, fusion_score in filtered_scores.items():
                         if cid in reranker_scores:
                             # Weight reranker score according to configuration
                             hybrid_scores[cid] = fusion_weight * fusion_score + reranker_weight * reranker_scores[cid]
-                        else:
-                            # Keep original fusion score for non-reranked candidates
-                            hybrid_scores[cid] = fusion_score
+
+                    # The reranked candidates are a protected set: the reranker only
+                    # reorders them, and candidates it did not score never overtake
+                    # them. Inserting them afterwards makes ties resolve to the set.
+                    protected_floor = min(hybrid_scores.values(), default=float("inf"))
+                    for cid, fusion_score in filtered_scores.items():
+                        if cid not in hybrid_scores:
+                            hybrid_scores[cid] = min(fusion_score, protected_floor)
 
                     final_scores = hybrid_scores
                     logger.debug(
@@ -579,40 +939,36 @@ class VectorStore:
             reverse=True,
         )
 
-        similarity_matrix = {}
-        # TODO: compute actual pairwise similarities once embedding metadata is available
-        for (meta_a, chunk_a), (meta_b, chunk_b) in zip(extracted, extracted[1:]):
-            key = ((meta_a.get("chunk_id") or chunk_a.id), (meta_b.get("chunk_id") or chunk_b.id))
-            similarity_matrix[key] = 0.0
+        # Diversify on the cosine similarity of each parent's winning child embedding.
+        # MMR always takes the top-scored candidate first and the last one is forced,
+        # so with two or fewer candidates (or lambda=1) it is the score order we have.
+        similarity = None
+        if retrieval_cfg.mmr_lambda < 1 and len(candidates_for_mmr) > 2:
+            similarity = self._hit_similarities(
+                results.get('embeddings'),
+                [active_lookup[cid].hit_index for cid, _ in candidates_for_mmr],
+            )
 
         selected_ids = max_marginal_relevance(
             candidates=candidates_for_mmr,
-            similarity_matrix=similarity_matrix,
-            lambda_param=settings.app_config.retrieval.mmr_lambda,
-            limit=settings.app_config.retrieval.final_passages,
+            similarity=similarity,
+            lambda_param=retrieval_cfg.mmr_lambda,
+            limit=retrieval_cfg.final_passages,
         )
 
-        if query_tokens:
-            lexical_rankings = self.bm25_index.query(query_tokens)
-            self._last_lexical_rankings = [
-                {
-                    "chunk_id": doc_id,
-                    "score": score,
-                    "metadata": (all_chunk_lookup.get(doc_id) or chunk_lookup.get(doc_id)).metadata if (all_chunk_lookup.get(doc_id) or chunk_lookup.get(doc_id)) else None,
-                }
-                for doc_id, score in lexical_rankings
-            ]
-        else:
-            self._last_lexical_rankings = []
+        self._last_lexical_query = (
+            (query_tokens, retrieval_cfg.lexical_k, record_lookup) if query_tokens else None
+        )
 
         scores_for_selected = {cid: final_scores.get(cid, 0.0) for cid in selected_ids}
         max_score_value = max(scores_for_selected.values(), default=0.0)
 
         selected_chunks: List[ParentChunk] = []
         for rank, cid in enumerate(selected_ids, start=1):
-            chunk = chunk_lookup.get(cid)
-            if not chunk:
+            record = active_lookup.get(cid)
+            if not record:
                 continue
+            chunk = self._parent_chunk_for(record)
             score = scores_for_selected.get(cid, 0.0)
             chunk.metadata.relevance_score = score
             chunk.metadata.relevance_rank = rank
@@ -629,11 +985,48 @@ class VectorStore:
         metrics.increment("retrieval.vector_store.selected", len(selected_chunks))
 
         effective_top_k = top_k or self.default_final_passages
-        result_chunks = selected_chunks[:effective_top_k]
+        return selected_chunks[:effective_top_k]
 
-        # Cache the result
+    @staticmethod
+    def _parent_chunk_for(record: _Candidate) -> ParentChunk:
+        """Builds (once) the ParentChunk for a candidate record that survived filtering."""
+        chunk = record.chunk
+        if chunk is None:
+            metadata = record.metadata
+            chunk_identifier = record.chunk_identifier
+            parent_metadata = DocumentMetadata(
+                page_title=metadata.get("page_title", ""),
+                space_name=metadata.get("space_name"),
+                space_key=metadata.get("space_key"),
+                source_url=metadata.get("source_url"),
+                url=metadata.get("url"),
+                headings=metadata["headings"],
+                last_modified=metadata.get("last_modified"),
+                document_id=record.document_id,
+                parent_chunk_id=record.parent_chunk_id,
+                chunk_id=chunk_identifier,
+                chunk_type="parent",
+                page_version=metadata.get("page_version"),
+                content_type=metadata.get("content_type"),
+                anchor_id=metadata.get("anchor_id"),
+            )
+            chunk = ParentChunk(
+                id=chunk_identifier,
+                text=record.parent_text,
+                metadata=parent_metadata
+            )
+            record.chunk = chunk
+        return chunk
+
+    def _get_cached_query(self, cache_key: str, current_time: float) -> Optional[List[ParentChunk]]:
+        cached_result = self._query_cache.get(cache_key)
+        if cached_result and current_time - cached_result['timestamp'] < self._query_cache_ttl:
+            return cached_result['chunks']
+        return None
+
+    def _cache_query_result(self, cache_key: str, chunks: List[ParentChunk], current_time: float) -> None:
         self._query_cache[cache_key] = {
-            'chunks': result_chunks,
+            'chunks': chunks,
             'timestamp': current_time
         }
 
@@ -643,7 +1036,92 @@ class VectorStore:
         for k in expired_keys:
             del self._query_cache[k]
 
-        return result_chunks
+    def _mark_corpus_changed(self) -> None:
+        """Invalidates the BM25 index and caches derived from the collection contents."""
+        self._bm25_needs_rebuild = True
+        self._lexical_index_chunk_ids = None
+        with self._routing_cache_lock:
+            self._routing_cache.clear()
+        with self._candidate_terms_cache_lock:
+            self._candidate_terms_cache.clear()
+        self._collection_count = None
+        self._discard_saved_lexical_index()
+
+    def _lexical_index_fingerprint(self, collection_count: int, chunk_ids: Sequence[str]) -> str:
+        """Identifies the collection contents a saved BM25 index was built from.
+
+        The digest of the sorted chunk ids catches deletes and adds made by
+        another process that leave the count unchanged. A chunk re-written
+        under the same id is not detected; delete the file at
+        ``retrieval.lexical_index_path`` after such out-of-band updates to
+        force a rebuild.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk_id in sorted(chunk_ids):
+            digest.update(chunk_id.encode("utf-8") + b"\0")
+        return (
+            f"{settings.child_collection_name}:{self._lexical_tokenizer_id}:"
+            f"{collection_count}:{digest.hexdigest()}"
+        )
+
+    def _load_saved_lexical_index(self, collection_count: int) -> bool:
+        self._lexical_index_load_pending = False
+        try:
+            # Ids only: far smaller than the documents a rebuild would fetch
+            chunk_ids = self.chroma.collection.get(limit=collection_count, include=[])["ids"]
+            loaded = self.bm25_index.load(
+                self._lexical_index_path,
+                fingerprint=self._lexical_index_fingerprint(collection_count, chunk_ids),
+            )
+        except Exception as exc:
+            logger.warning("Failed to load BM25 index from %s: %s", self._lexical_index_path, exc)
+            return False
+        if loaded:
+            self._lexical_index_chunk_ids = list(chunk_ids)
+            logger.info(
+                "BM25 index loaded from %s with %d documents",
+                self._lexical_index_path,
+                self.bm25_index.corpus_size,
+            )
+        return loaded
+
+    def save_lexical_index(self) -> None:
+        """Saves the BM25 index if it was extended since it was last built or loaded.
+
+        Incremental ingests discard the saved file, so this is called on
+        shutdown to let the next start load the extended index. The fingerprint
+        uses the chunk ids this process indexed, so a restart still rebuilds
+        if another process changed the collection in the meantime.
+        """
+        chunk_ids = self._lexical_index_chunk_ids
+        if self._bm25_needs_rebuild or chunk_ids is None or not self._lexical_index_path:
+            return
+        if os.path.exists(self._lexical_index_path):
+            # Already saved for this state
+            return
+        self._save_lexical_index(len(chunk_ids), chunk_ids)
+
+    def _save_lexical_index(self, collection_count: int, chunk_ids: Sequence[str]) -> None:
+        if not self._lexical_index_path:
+            return
+        try:
+            self.bm25_index.save(
+                self._lexical_index_path,
+                fingerprint=self._lexical_index_fingerprint(collection_count, chunk_ids),
+            )
+        except Exception as exc:
+            logger.warning("Failed to save BM25 index to %s: %s", self._lexical_index_path, exc)
+
+    def _discard_saved_lexical_index(self) -> None:
+        """Removes the saved index once the collection changes, so a restart cannot load stale postings."""
+        if not self._lexical_index_path:
+            return
+        try:
+            os.remove(self._lexical_index_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Failed to remove BM25 index at %s: %s", self._lexical_index_path, exc)
 
     def _ensure_bm25_index(self) -> None:
         """Rebuild BM25 index from ChromaDB if needed."""
@@ -654,12 +1132,17 @@ class VectorStore:
             logger.debug("Rebuilding BM25 index from ChromaDB")
             collection = self.chroma.collection
             count = collection.count()
+            self._remember_collection_count(count)
 
             if count == 0:
                 logger.debug("No documents in ChromaDB, skipping BM25 index build")
                 self._bm25_needs_rebuild = False
                 return
 
+            if self._lexical_index_load_pending and self._load_saved_lexical_index(count):
+                self._bm25_needs_rebuild = False
+                return
+
             # Fetch all documents from ChromaDB
             # Use peek with limit to get all documents efficiently
             results = collection.get(limit=count, include=["documents", "metadatas"])
@@ -672,22 +1155,49 @@ class VectorStore:
             documents = results['documents']
             metadatas = results.get('metadatas', [])
 
-            # Tokenize all documents for BM25
-            corpus_tokens = []
-            doc_ids = []
+            # Tokenize all documents for BM25. Sibling child chunks usually share the
+            # same parent text and metadata, so each distinct candidate text is
+            # tokenized once and its token list shared between those documents.
+            # Chunks written with lexical_tokens skip tokenization and just split
+            # the stored string.
+            candidate_rows: List[Tuple[str, Any]] = []
+            tokens_by_text: Dict[Tuple[str, ...], List[str]] = {}
+            stored_tokens: Dict[str, List[str]] = {}
 
             for i, (doc_id, text) in enumerate(zip(ids, documents)):
                 if not text:
                     continue
 
-                # Get parent_chunk_text if available for better lexical matching
                 metadata = metadatas[i] if i < len(metadatas) else {}
+                if metadata.get("lexical_tokenizer") == self._lexical_tokenizer_id:
+                    stored = metadata.get("lexical_tokens") or ""
+                    if stored not in stored_tokens:
+                        stored_tokens[stored] = stored.split()
+                    candidate_rows.append((doc_id, stored))
+                    continue
+
+                # Get parent_chunk_text if available for better lexical matching
                 parent_text = metadata.get('parent_chunk_text', text)
 
                 # Build candidate text with metadata enrichment
-                candidate_text = self._build_candidate_text(parent_text, metadata)
-                tokens = self._tokenize_text(candidate_text)
+                candidate_parts = tuple(self._candidate_text_parts(parent_text, metadata))
+                candidate_rows.append((doc_id, candidate_parts))
+                tokens_by_text[candidate_parts] = []
+
+            # Large corpora are tokenized across worker processes
+            distinct_parts = list(tokens_by_text)
+            tokens_by_text = dict(zip(
+                distinct_parts,
+                tokenize_many(distinct_parts, self._token_pattern, self._stopwords),
+            ))
 
+            corpus_tokens = []
+            doc_ids = []
+            for doc_id, candidate_key in candidate_rows:
+                if isinstance(candidate_key, str):
+                    tokens = stored_tokens[candidate_key]
+                else:
+                    tokens = tokens_by_text[candidate_key]
                 if tokens:
                     corpus_tokens.append(tokens)
                     doc_ids.append(doc_id)
@@ -695,7 +1205,13 @@ class VectorStore:
             # Build the BM25 index
             self.bm25_index.build(corpus_tokens, doc_ids)
             self._bm25_needs_rebuild = False
-            logger.info("BM25 index rebuilt with %d documents", len(doc_ids))
+            self._lexical_index_chunk_ids = list(ids)
+            self._save_lexical_index(count, ids)
+            logger.info(
+                "BM25 index rebuilt with %d documents (%d distinct texts tokenized)",
+                len(doc_ids),
+                len(tokens_by_text),
+            )
 
         except Exception as exc:
             logger.error("Failed to rebuild BM25 index: %s", exc)
@@ -730,25 +1246,104 @@ class VectorStore:
 
         return chunk_text
 
-    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generates embeddings for a list of texts."""
-        return self.embedding_client.embed(texts)
+    def _get_collection_count(self) -> int:
+        count = self._fresh_collection_count()
+        if count is None:
+            count = self.chroma.count()
+            self._remember_collection_count(count)
+        return count
+
+    async def _get_collection_count_async(self) -> int:
+        count = self._fresh_collection_count()
+        if count is None:
+            count = await self.chroma.count_async()
+            self._remember_collection_count(count)
+        return count
+
+    def _fresh_collection_count(self) -> Optional[int]:
+        if self._collection_count is None:
+            return None
+        if time.monotonic() - self._collection_count_at > self._collection_count_ttl:
+            return None
+        return self._collection_count
+
+    def _remember_collection_count(self, count: int) -> None:
+        self._collection_count = count
+        self._collection_count_at = time.monotonic()
+
+    def _embed_query(self, query_text: str) -> np.ndarray:
+        """Embeds a query, reusing the vector of an equivalent recent query."""
+        key = self._query_embedding_key(query_text)
+        vector = self._cached_query_embedding(key)
+        if vector is None:
+            vector = self._get_embeddings([query_text])[0]
+            self._remember_query_embedding(key, vector)
+        return vector
+
+    async def _embed_query_async(self, query_text: str) -> np.ndarray:
+        key = self._query_embedding_key(query_text)
+        vector = self._cached_query_embedding(key)
+        if vector is None:
+            vector = np.asarray(
+                await self.embedding_client.embed_query_async(query_text),
+                dtype=_EMBEDDING_DTYPE,
+            )
+            self._remember_query_embedding(key, vector)
+        return vector
+
+    @staticmethod
+    def _query_embedding_key(query_text: str) -> str:
+        return " ".join(query_text.split()).casefold()
+
+    def _cached_query_embedding(self, key: str) -> Optional[np.ndarray]:
+        if not self._query_embedding_cache_enabled:
+            return None
+        with self._query_embedding_cache_lock:
+            entry = self._query_embedding_cache.get(key)
+            if entry is not None and self._query_embedding_cache_ttl:
+                if time.monotonic() - entry[1] > self._query_embedding_cache_ttl:
+                    self._query_embedding_cache.pop(key, None)
+                    entry = None
+            if entry is not None:
+                self._query_embedding_cache.move_to_end(key)
+        if entry is None:
+            metrics.increment("retrieval.vector_store.query_embedding_cache_miss")
+            return None
+        vector = entry[0]
+        metrics.increment("retrieval.vector_store.query_embedding_cache_hit")
+        return vector
+
+    def _remember_query_embedding(self, key: str, vector: np.ndarray) -> None:
+        if not self._query_embedding_cache_enabled or self._query_embedding_cache_max_items <= 0:
+            return
+        with self._query_embedding_cache_lock:
+            self._query_embedding_cache[key] = (vector, time.monotonic())
+            self._query_embedding_cache.move_to_end(key)
+            if len(self._query_embedding_cache) > self._query_embedding_cache_max_items:
+                self._query_embedding_cache.popitem(last=False)
+
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generates embeddings for a list of texts as an (N, D) float16 array."""
+        return np.asarray(self.embedding_client.embed(texts), dtype=_EMBEDDING_DTYPE)
 
-    def _load_stopwords(self, language: Optional[str]) -> set[str]:
+    def _load_stopwords(self, language: Optional[str]) -> frozenset[str]:
         """Loads stopwords for the configured language."""
         if not language:
-            return set()
+            return frozenset()
         try:
-            return set(stopwords(language))
+            return frozenset(stopwords(language))
         except KeyError:
             logger.warning(
                 "Stopword language '%s' is not supported; disabling stopword filtering.",
                 language,
             )
-            return set()
+            return frozenset()
 
-    def _build_candidate_text(self, parent_text: str, metadata: Dict[str, Any]) -> str:
-        """Creates enriched lexical corpus string with comprehensive metadata for better BM25 matching."""
+    def _candidate_text_parts(self, parent_text: str, metadata: Dict[str, Any]) -> List[str]:
+        """Collects the enriched lexical corpus text, with comprehensive metadata for better BM25 matching.
+
+        The parts are tokenized separately rather than joined into one string.
+        """
         parts = [parent_text]
 
         # HIGH PRIORITY: Core document metadata (repeated 2x for higher BM25 weight)
@@ -761,8 +1356,8 @@ class VectorStore:
         # MEDIUM PRIORITY: Structural metadata (headings show document structure)
         headings = metadata.get("headings")
         if isinstance(headings, str):
-            if headings:
-                parts.extend(headings.split(' | '))
+            # " | " separators never produce tokens, so the joined form can be tokenized as-is
+            parts.append(headings)
         elif isinstance(headings, list):
             parts.extend([heading for heading in headings if heading])
 
@@ -781,35 +1376,56 @@ class VectorStore:
             if value:
                 parts.append(str(value))
 
-        return " ".join(parts)
+        return parts
 
     def _tokenize_text(self, text: str) -> List[str]:
         """Tokenizes text into normalized terms for lexical scoring."""
         if not text:
             return []
-
-        tokens = self._token_pattern.findall(text.lower())
-        filtered = [
-            token
-            for token in tokens
-            if len(token) >= self._min_token_length
-            and token not in self._stopwords
-            and not token.isdigit()
-        ]
-        return filtered
+        # The same query text recurs (retries, repeated questions), so reuse its tokens
+        return list(tokenize_cached(text, self._token_pattern, self._stopwords))
+
+    def _candidate_terms(self, candidate: _Candidate) -> frozenset[str]:
+        """Distinct tokens of a candidate the lexical index does not know about."""
+        # Such hits (empty token lists, writes from another process) recur across
+        # queries until the next rebuild, so their terms are kept per chunk text
+        key = (candidate.candidate_id, hash(candidate.parent_text))
+        with self._candidate_terms_cache_lock:
+            terms = self._candidate_terms_cache.get(key)
+            if terms is not None:
+                self._candidate_terms_cache.move_to_end(key)
+                return terms
+
+        tokens = self._stored_tokens(candidate.metadata)
+        if tokens is None:
+            tokens = self._tokenize_parts(
+                self._candidate_text_parts(candidate.parent_text, candidate.metadata)
+            )
+        terms = frozenset(tokens)
+        with self._candidate_terms_cache_lock:
+            self._candidate_terms_cache[key] = terms
+            if len(self._candidate_terms_cache) > self._candidate_terms_cache_max_items:
+                self._candidate_terms_cache.popitem(last=False)
+        return terms
+
+    def _stored_tokens(self, metadata: Dict[str, Any]) -> Optional[List[str]]:
+        """Returns the tokens written at ingest, or None if absent or from another tokenizer setup."""
+        if metadata.get("lexical_tokenizer") != self._lexical_tokenizer_id:
+            return None
+        return (metadata.get("lexical_tokens") or "").split()
+
+    def _tokenize_parts(self, parts: Iterable[str]) -> List[str]:
+        """Tokenizes several text fragments as if they had been joined by whitespace."""
+        return tokenize_parts(parts, self._token_pattern, self._stopwords)
 
     def _calculate_lexical_scores(
         self,
         query_tokens: List[str],
-        candidate_tokens_list: List[List[str]],
         candidate_ids: List[str],
-    ) -> List[float]:
+    ) -> np.ndarray:
         """Calculates normalized lexical relevance scores using BM25."""
-        if not candidate_tokens_list:
-            return []
-
-        scores = [0.0] * len(candidate_tokens_list)
-        if not query_tokens:
+        scores = np.zeros(len(candidate_ids), dtype=np.float64)
+        if not len(scores) or not query_tokens:
             return scores
 
         # Ensure BM25 index is built (lazy rebuild from ChromaDB if needed)
@@ -821,49 +1437,53 @@ class VectorStore:
         if self.bm25_index.corpus_size == 0:
             return scores
 
-        # Get BM25 rankings for all documents in the index
-        bm25_rankings = self.bm25_index.query(query_tokens)
-        bm25_score_map = {doc_id: score for doc_id, score in bm25_rankings}
-
-        # Map scores back to our candidates
-        for idx, candidate_id in enumerate(candidate_ids):
-            scores[idx] = bm25_score_map.get(candidate_id, 0.0)
+        # Corpus stats and the doc_id -> row map live on the index, so the
+        # candidates are looked up by row instead of sorting the whole corpus.
+        return self.bm25_index.scores_for_ids(query_tokens, candidate_ids)
 
-        return scores
-
-    def _combine_scores(self, embedding_score: float, lexical_score: float) -> float:
-        """Combines embedding similarity and lexical relevance into a single ranking score."""
-        weight = settings.lexical_overlap_weight
-        embedding_component = embedding_score * (1 - weight)
-        lexical_component = lexical_score * weight
-        return embedding_component + lexical_component
-
-    def _calculate_embedding_score(
-        self,
-        index: int,
+    @staticmethod
+    def _embedding_scores(
+        count: int,
         distances: List[List[Optional[float]]],
         similarities: List[List[Optional[float]]],
-    ) -> float:
-        """Normalizes embedding-based relevance scores from the vector store."""
-        if similarities and similarities[0] and index < len(similarities[0]):
-            similarity = similarities[0][index]
-            if similarity is not None:
-                return float(similarity)
+    ) -> np.ndarray:
+        """Normalizes embedding-based relevance scores from the vector store for the first ``count`` hits.
 
-        if distances and distances[0] and index < len(distances[0]):
-            distance = distances[0][index]
-            if distance is not None:
-                # Convert distance to a bounded similarity score regardless of metric.
-                return 1.0 / (1.0 + float(distance))
+        A similarity is used as-is when present; otherwise the distance is
+        converted to a bounded similarity regardless of metric, and hits with
+        neither score 0.
+        """
+        scores = np.zeros(count, dtype=np.float64)
+        if distances and distances[0]:
+            row = _score_row(distances[0], count)
+            scores = np.where(np.isnan(row), scores, 1.0 / (1.0 + row))
+        if similarities and similarities[0]:
+            row = _score_row(similarities[0], count)
+            scores = np.where(np.isnan(row), scores, row)
+        return scores
 
-        return 0.0
+    @staticmethod
+    def _hit_similarities(embeddings: Any, hit_rows: List[int]) -> Optional[np.ndarray]:
+        """Pairwise cosine similarity of the given hits, or None if embeddings were not returned."""
+        if embeddings is None or len(embeddings) == 0 or embeddings[0] is None or not hit_rows:
+            return None
+        rows = embeddings[0]
+        # Only the winning hit per parent is converted, not every returned vector
+        if isinstance(rows, np.ndarray):
+            vectors = rows[hit_rows].astype(np.float32)
+        else:
+            vectors = np.asarray([rows[row] for row in hit_rows], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        return vectors @ vectors.T
 
     def clear_collection(self):
         """Clears all documents from the collection."""
         try:
             self.chroma.reset()
             # Reset BM25 index after clearing collection
-            self._bm25_needs_rebuild = True
+            self._mark_corpus_changed()
             # Don't build with empty corpus - just mark for rebuild
             logger.debug("Cleared collection and marked BM25 for rebuild")
         except Exception as e:
@@ -873,7 +1493,7 @@ class VectorStore:
     def health_check(self) -> bool:
         """Check if the vector store is healthy and connected."""
         try:
-            self.chroma.ensure_connection()
+            self.chroma.ensure_connection(force=True)
             self.embedding_client.health_check()
             return True
         except Exception as e:
@@ -882,7 +1502,18 @@ class VectorStore:
 
     def last_lexical_rankings(self) -> List[Dict[str, Any]]:
         """Return lexical rankings from the most recent query call."""
-        return list(self._last_lexical_rankings)
+        if self._last_lexical_query is None:
+            return []
+        query_tokens, lexical_k, record_lookup = self._last_lexical_query
+        rankings = []
+        for doc_id, score in self.bm25_index.top_k(query_tokens, lexical_k):
+            record = record_lookup.get(doc_id)
+            rankings.append({
+                "chunk_id": doc_id,
+                "score": score,
+                "metadata": self._parent_chunk_for(record).metadata if record is not None else None,
+            })
+        return rankings
 
     def get_context_for_routing(self, query: str, max_samples: int = 10) -> RoutingContext:
         """
@@ -900,17 +1531,24 @@ class VectorStore:
             configured_sample_size = settings.app_config.ui_settings.routing_sample_size
             effective_max_samples = max(1, min(max_samples, configured_sample_size)) if configured_sample_size else max_samples
 
+            cache_key = (query, effective_max_samples)
+            now = time.time()
+            with self._routing_cache_lock:
+                cached = self._routing_cache.get(cache_key)
+            if cached and now - cached[1] < self._routing_cache_ttl:
+                return cached[0]
+
             if not self.chroma:
                 logger.warning("ChromaDB not available for routing context")
                 return RoutingContext([], "unavailable")
 
-            collection = self.chroma.collection
-            if not collection or collection.count() == 0:
+            if self._get_collection_count() == 0:
                 logger.debug("No documents available for routing context")
                 return RoutingContext([], "empty")
 
             # Try using the existing query system for context (lightweight approach)
             # Perform a small query to get potentially relevant documents
+            query_failed = False
             try:
                 # Use the existing query method with a small k to get relevant context
                 parent_chunks = self.query(
@@ -930,19 +1568,40 @@ class VectorStore:
 
                     if context_docs:
                         logger.debug("Found %d relevant documents for routing context via query", len(context_docs))
-                        return RoutingContext(context_docs, "vector_query")
+                        return self._cache_routing_context(
+                            cache_key, RoutingContext(context_docs, "vector_query"), now
+                        )
 
             except Exception as e:
                 logger.warning("Query-based context search failed: %s", e)
+                query_failed = True
 
             # Fallback to random corpus sample if query doesn't work
             logger.debug("Using random corpus sample for routing context")
-            return RoutingContext(self.get_corpus_sample(effective_max_samples), "corpus_sample")
+            context = RoutingContext(self.get_corpus_sample(effective_max_samples), "corpus_sample")
+            if query_failed:
+                # A transient error should not pin the degraded context for the TTL
+                return context
+            return self._cache_routing_context(cache_key, context, now)
 
         except Exception as e:
             logger.error("Error getting routing context: %s", e)
             return RoutingContext([], "error")
 
+    def _cache_routing_context(
+        self,
+        cache_key: Tuple[str, int],
+        context: RoutingContext,
+        current_time: float,
+    ) -> RoutingContext:
+        with self._routing_cache_lock:
+            self._routing_cache.pop(cache_key, None)
+            self._routing_cache[cache_key] = (context, current_time)
+            if len(self._routing_cache) > self._routing_cache_max_items:
+                # Dicts keep insertion order, so the first key is the oldest entry
+                del self._routing_cache[next(iter(self._routing_cache))]
+        return context
+
     def get_corpus_sample(self, sample_size: int = 50) -> List[str]:
         """
         Get a representative sample of documents from the corpus for similarity comparison.
@@ -964,17 +1623,10 @@ class VectorStore:
                 logger.warning("No collection available for corpus sampling")
                 return []
 
-            # Get collection count
-            count = collection.count()
-            if count == 0:
-                logger.warning("Empty collection for corpus sampling")
-                return []
-
-            # Sample documents - use peek for random sampling
-            actual_sample_size = min(sample_size, count)
-
-            # Get random sample of documents
-            results = collection.peek(limit=actual_sample_size)
+            # Sample documents. Unlike peek(), this skips the embeddings and
+            # metadata (which carry the full parent text) and needs no
+            # separate count() round trip; an empty collection returns no rows.
+            results = collection.get(limit=max(1, sample_size), include=["documents"])
 
             if not results or not results.get('documents'):
                 logger.warning("No documents returned from corpus sampling")
@@ -3,7 +3,7 @@
 import re
 import time
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 from datetime import datetime
@@ -12,6 +12,40 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Scrape patterns are compiled once at import rather than on every parse.
+# Model name: a direct model label first, then any vLLM metric with a model label
+_MODEL_NAME_PATTERNS = [
+    re.compile(r'vllm:model_name\{[^}]*model="([^"]*)"[^}]*\}\s+([\d.e+-]+)', re.MULTILINE),
+    re.compile(r'vllm:.*\{[^}]*model="([^"]*)"[^}]*\}\s+([\d.e+-]+)', re.MULTILINE),
+]
+
+# Samples read from the scrape: gauges give a current value, and histogram
+# _sum/_count pairs give an average
+_GAUGE_SAMPLES = {
+    'vllm:num_requests_running': 'num_requests_running',
+    'vllm:num_requests_waiting': 'num_requests_waiting',
+    'vllm:num_requests_swapped': 'num_requests_swapped',
+    'vllm:prompt_tokens_total': 'prompt_tokens_total',
+    'vllm:generation_tokens_total': 'generation_tokens_total',
+    'vllm:gpu_cache_usage_perc': 'gpu_cache_usage_perc',
+    'vllm:kv_cache_usage_perc': 'gpu_cache_usage_perc',
+}
+_HISTOGRAM_METRICS = (
+    'time_to_first_token_seconds',
+    'time_per_output_token_seconds',
+    'e2e_request_latency_seconds',
+)
+_HISTOGRAM_SAMPLES = {
+    f'vllm:{metric_name}_{part}': (metric_name, part)
+    for metric_name in _HISTOGRAM_METRICS
+    for part in ('sum', 'count')
+}
+# Every sample above in one scan: (sample name, value)
+_SAMPLE_PATTERN = re.compile(
+    r'(vllm:(?:%s))\{[^}]*\}\s+([\d.e+-]+)'
+    % '|'.join(re.escape(name[len('vllm:'):]) for name in (*_GAUGE_SAMPLES, *_HISTOGRAM_SAMPLES))
+)
+
 
 @dataclass
 class VLLMMetrics:
@@ -47,13 +81,14 @@ class VLLMMetrics:
 class VLLMMetricsCollector:
     """Collects and parses vLLM prometheus metrics."""
 
-    def __init__(self, services: Optional[Dict[str, str]] = None):
+    def __init__(self, services: Optional[Dict[str, str]] = None, cache_ttl: float = 1.0):
         """
         Initialize with vLLM service endpoints.
 
         Args:
             services: Dict mapping service names to base URLs
                      e.g. {"llm": "http://localhost:8000", "embeddings": "http://localhost:8001"}
+            cache_ttl: Seconds a successful scrape is reused; 0 disables caching
         """
         self.services = services or {
             "llm": "http://localhost:8000",
@@ -61,19 +96,92 @@ class VLLMMetricsCollector:
             "reranker": "http://localhost:8002"
         }
         self.session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Parsed metrics per service with the time they were scraped, so
+        # dashboards polling together share one scrape per TTL window
+        self._cache: Dict[str, Tuple[float, VLLMMetrics]] = {}
+        self._cache_ttl = cache_ttl
+        # Scrape in flight per service; concurrent callers all await its result
+        self._inflight: Dict[str, "asyncio.Task[Optional[VLLMMetrics]]"] = {}
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        await self.get_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        await self.close()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the collector's session, opening it on first use.
+
+        The session and its keep-alive connections are reused across scrapes;
+        a session is bound to its event loop, so a new loop gets a new one.
+        """
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self._session_loop is not loop:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, limit_per_host=8, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=5),
+            )
+            self._session_loop = loop
+            # Tasks belong to the loop that created them
+            self._inflight.clear()
+        return self.session
+
+    async def close(self) -> None:
+        """Close the session and its pooled connections."""
+        if self.session and not self.session.closed:
             await self.session.close()
+        self.session = None
+        self._session_loop = None
+        self.reset_cache()
+
+    def reset_cache(self) -> None:
+        """Drop cached metrics so the next call scrapes every service."""
+        self._cache.clear()
+
+    def _cached_metrics(self, service_name: str) -> Optional[VLLMMetrics]:
+        cached = self._cache.get(service_name)
+        if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+            return cached[1]
+        return None
 
     async def fetch_metrics(self, service_name: str) -> Optional[VLLMMetrics]:
-        """Fetch and parse metrics for a specific vLLM service."""
-        if not self.session:
-            raise RuntimeError("VLLMMetricsCollector must be used as async context manager")
+        """Fetch and parse metrics for a specific vLLM service.
+
+        Results are reused for ``cache_ttl`` seconds, and callers arriving
+        while a scrape is in flight share its result, including a failure,
+        instead of starting another. Failed scrapes are not cached beyond that.
+        """
+        if self._cache_ttl <= 0:
+            return await self._scrape_metrics(service_name)
+
+        cached = self._cached_metrics(service_name)
+        if cached is not None:
+            return cached
+
+        await self.get_session()
+        task = self._inflight.get(service_name)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._scrape_and_cache(service_name))
+            self._inflight[service_name] = task
+            task.add_done_callback(lambda done: self._forget_inflight(service_name, done))
+        # Shielded so one caller giving up does not cancel the scrape for the rest
+        return await asyncio.shield(task)
+
+    async def _scrape_and_cache(self, service_name: str) -> Optional[VLLMMetrics]:
+        metrics = await self._scrape_metrics(service_name)
+        if metrics is not None:
+            self._cache[service_name] = (time.monotonic(), metrics)
+        return metrics
+
+    def _forget_inflight(self, service_name: str, task: "asyncio.Task[Optional[VLLMMetrics]]") -> None:
+        if self._inflight.get(service_name) is task:
+            del self._inflight[service_name]
+
+    async def _scrape_metrics(self, service_name: str) -> Optional[VLLMMetrics]:
+        """Fetch /metrics for a service and parse it, bypassing the cache."""
+        session = await self.get_session()
 
         base_url = self.services.get(service_name)
         if not base_url:
@@ -83,19 +191,25 @@ class VLLMMetricsCollector:
         metrics_url = f"{base_url}/metrics"
 
         try:
-            async with self.session.get(metrics_url) as response:
+            async with session.get(metrics_url) as response:
                 if response.status != 200:
                     logger.warning(f"Failed to fetch metrics from {metrics_url}: {response.status}")
                     return None
 
-                text = await response.text()
-                metrics = self._parse_prometheus_metrics(text, service_name)
+                # Check the raw body first so backends without vLLM metrics
+                # skip decoding the payload altogether
+                raw = await response.read()
+                if b'vllm:' in raw:
+                    metrics = self._parse_prometheus_metrics(raw.decode('utf-8', 'replace'), service_name)
+                else:
+                    logger.debug(f"No vLLM metrics found for {service_name}, service may not be configured for metrics")
+                    metrics = VLLMMetrics(model_name=service_name)
 
                 # Try to get model info from /v1/models endpoint if model name is still generic
                 if metrics.model_name == service_name:
                     try:
                         models_url = f"{base_url}/v1/models"
-                        async with self.session.get(models_url) as models_response:
+                        async with session.get(models_url) as models_response:
                             if models_response.status == 200:
                                 models_data = await models_response.json()
                                 if models_data.get("data") and len(models_data["data"]) > 0:
@@ -117,90 +231,71 @@ class VLLMMetricsCollector:
 
     async def fetch_all_metrics(self) -> Dict[str, VLLMMetrics]:
         """Fetch metrics from all configured vLLM services."""
-        results = {}
-
-        for service_name in self.services:
-            metrics = await self.fetch_metrics(service_name)
-            if metrics:
-                results[service_name] = metrics
-
-        return results
+        # Services are independent endpoints, so scrape them concurrently
+        service_names = list(self.services)
+        fetched = await asyncio.gather(*(self.fetch_metrics(name) for name in service_names))
+        return {name: metrics for name, metrics in zip(service_names, fetched) if metrics}
 
     def _parse_prometheus_metrics(self, metrics_text: str, service_name: str) -> VLLMMetrics:
         """Parse prometheus metrics text into VLLMMetrics object."""
         metrics = VLLMMetrics(model_name=service_name)
 
-        # Try to extract model name from vLLM metrics
-        # Look for model info in various vLLM metrics
-        model_patterns = [
-            r'vllm:model_name\{[^}]*model="([^"]*)"[^}]*\}\s+([\d.e+-]+)',  # Direct model label
-            r'vllm:.*\{[^}]*model="([^"]*)"[^}]*\}\s+([\d.e+-]+)',  # Any metric with model label
-        ]
-
-        for pattern in model_patterns:
-            model_match = re.search(pattern, metrics_text, re.MULTILINE)
-            if model_match:
-                try:
-                    model_name = model_match.group(1)
-                    # Only use if it's a real model name (not just numbers or empty)
-                    if model_name and not model_name.replace('-', '').replace('_', '').replace('/', '').isdigit():
-                        metrics.model_name = model_name
-                        break
-                except (ValueError, AttributeError, IndexError):
-                    continue
-
-        # Check if vLLM-specific metrics are available
+        # Check if vLLM-specific metrics are available (every pattern below needs them)
         if 'vllm:' not in metrics_text:
             logger.debug(f"No vLLM metrics found for {service_name}, service may not be configured for metrics")
             return metrics
 
-        # Define metric patterns - use gauge patterns for current values and histogram _sum/_count for averages
-        gauge_patterns = {
-            'num_requests_running': r'vllm:num_requests_running{[^}]*}\s+([\d.e+-]+)',
-            'num_requests_waiting': r'vllm:num_requests_waiting{[^}]*}\s+([\d.e+-]+)',
-            'num_requests_swapped': r'vllm:num_requests_swapped{[^}]*}\s+([\d.e+-]+)',
-            'prompt_tokens_total': r'vllm:prompt_tokens_total{[^}]*}\s+([\d.e+-]+)',
-            'generation_tokens_total': r'vllm:generation_tokens_total{[^}]*}\s+([\d.e+-]+)',
-            'gpu_cache_usage_perc': r'vllm:(?:gpu_cache_usage_perc|kv_cache_usage_perc){[^}]*}\s+([\d.e+-]+)',
-        }
-
-        # Histogram patterns for calculating averages from _sum and _count
-        histogram_patterns = {
-            'time_to_first_token_seconds': 'vllm:time_to_first_token_seconds',
-            'time_per_output_token_seconds': 'vllm:time_per_output_token_seconds',
-            'e2e_request_latency_seconds': 'vllm:e2e_request_latency_seconds',
-        }
+        # Look for model info in various vLLM metrics; both patterns need a model
+        # label, and ruling that out is cheaper than a failed search
+        model_matches: List[Optional[str]] = []
+        if 'model="' in metrics_text:
+            for pattern in _MODEL_NAME_PATTERNS:
+                model_match = pattern.search(metrics_text)
+                model_matches.append(model_match.group(1) if model_match else None)
+
+        # One scan for all gauge and histogram samples instead of a search per
+        # metric; as with a search, the first sample of each metric wins
+        gauge_values: Dict[str, str] = {}
+        histogram_values: Dict[Tuple[str, str], str] = {}
+        for sample_name, raw_value in _SAMPLE_PATTERN.findall(metrics_text):
+            gauge_name = _GAUGE_SAMPLES.get(sample_name)
+            if gauge_name is not None:
+                gauge_values.setdefault(gauge_name, raw_value)
+            else:
+                histogram_values.setdefault(_HISTOGRAM_SAMPLES[sample_name], raw_value)
+
+        for model_name in model_matches:
+            # Only use if it's a real model name (not just numbers or empty)
+            if model_name is not None:
+                if model_name and not model_name.replace('-', '').replace('_', '').replace('/', '').isdigit():
+                    metrics.model_name = model_name
+                    break
 
         # Parse gauge metrics
-        for metric_name, pattern in gauge_patterns.items():
-            match = re.search(pattern, metrics_text, re.MULTILINE)
-            if match:
-                try:
-                    value = float(match.group(1))
-                    # GPU cache usage is already a percentage (1.0 = 100%), but might be very small
-                    if metric_name == 'gpu_cache_usage_perc':
-                        value = value * 100  # Convert to 0-100 scale
-                    setattr(metrics, metric_name, value)
-                except (ValueError, AttributeError):
-                    logger.debug(f"Failed to parse gauge {metric_name}: {match.group(1)}")
+        for metric_name, raw_value in gauge_values.items():
+            try:
+                value = float(raw_value)
+                # GPU cache usage is already a percentage (1.0 = 100%), but might be very small
+                if metric_name == 'gpu_cache_usage_perc':
+                    value = value * 100  # Convert to 0-100 scale
+                setattr(metrics, metric_name, value)
+            except ValueError:
+                logger.debug(f"Failed to parse gauge {metric_name}: {raw_value}")
 
         # Parse histogram metrics (calculate averages from _sum and _count)
-        for metric_name, metric_prefix in histogram_patterns.items():
-            sum_pattern = rf'{metric_prefix}_sum{{[^}}]*}}\s+([\d.e+-]+)'
-            count_pattern = rf'{metric_prefix}_count{{[^}}]*}}\s+([\d.e+-]+)'
-
-            sum_match = re.search(sum_pattern, metrics_text, re.MULTILINE)
-            count_match = re.search(count_pattern, metrics_text, re.MULTILINE)
+        for metric_name in _HISTOGRAM_METRICS:
+            sum_raw = histogram_values.get((metric_name, 'sum'))
+            count_raw = histogram_values.get((metric_name, 'count'))
 
-            if sum_match and count_match:
+            if sum_raw is not None and count_raw is not None:
                 try:
-                    sum_value = float(sum_match.group(1))
-                    count_value = float(count_match.group(1))
+                    sum_value = float(sum_raw)
+                    count_value = float(count_raw)
 
                     if count_value > 0:
                         avg_value = sum_value / count_value
                         setattr(metrics, metric_name, avg_value)
-                except (ValueError, AttributeError, ZeroDivisionError):
+                except (ValueError, ZeroDivisionError):
                     logger.debug(f"Failed to parse histogram {metric_name}")
 
         # Calculate tokens per second - use time_per_output_token_seconds for generation throughput
@@ -216,8 +311,7 @@ class VLLMMetricsCollector:
 
     async def health_check(self, service_name: str) -> bool:
         """Check if a vLLM service is healthy and responding."""
-        if not self.session:
-            raise RuntimeError("VLLMMetricsCollector must be used as async context manager")
+        session = await self.get_session()
 
         base_url = self.services.get(service_name)
         if not base_url:
@@ -227,7 +321,7 @@ class VLLMMetricsCollector:
             # Try the health endpoint first, fallback to metrics
             for endpoint in ["/health", "/metrics"]:
                 try:
-                    async with self.session.get(f"{base_url}{endpoint}") as response:
+                    async with session.get(f"{base_url}{endpoint}") as response:
                         return response.status == 200
                 except:
                     continue
@@ -237,49 +331,51 @@ class VLLMMetricsCollector:
             return False
 
 
-# Global metrics collector instance
+# Global metrics collector instance; its session is kept open between scrapes
 metrics_collector = VLLMMetricsCollector()
 
 
+async def close_vllm_metrics() -> None:
+    """Close the global collector's session; called on application shutdown."""
+    await metrics_collector.close()
+
+
 async def get_vllm_metrics() -> Dict[str, Any]:
     """Get current vLLM metrics for all services."""
-    async with VLLMMetricsCollector() as collector:
-        metrics = await collector.fetch_all_metrics()
-
-        # Convert to serializable format
-        result = {}
-        for service_name, service_metrics in metrics.items():
-            result[service_name] = {
-                "num_requests_running": service_metrics.num_requests_running,
-                "num_requests_waiting": service_metrics.num_requests_waiting,
-                "num_requests_swapped": service_metrics.num_requests_swapped,
-                "time_to_first_token_seconds": service_metrics.time_to_first_token_seconds,
-                "time_per_output_token_seconds": service_metrics.time_per_output_token_seconds,
-                "e2e_request_latency_seconds": service_metrics.e2e_request_latency_seconds,
-                "prompt_tokens_total": service_metrics.prompt_tokens_total,
-                "generation_tokens_total": service_metrics.generation_tokens_total,
-                "tokens_per_second": service_metrics.tokens_per_second,
-                "gpu_cache_usage_perc": service_metrics.gpu_cache_usage_perc,
-                "gpu_memory_usage": service_metrics.gpu_memory_usage,
-                "model_name": service_metrics.model_name,
-                "timestamp": service_metrics.timestamp.isoformat() if service_metrics.timestamp else None,
-                "metrics_available": any([
-                    service_metrics.num_requests_running > 0,
-                    service_metrics.num_requests_waiting > 0,
-                    service_metrics.time_to_first_token_seconds > 0,
-                    service_metrics.prompt_tokens_total > 0,
-                    service_metrics.generation_tokens_total > 0,
-                    service_metrics.tokens_per_second > 0
-                ])
-            }
-
-        return result
+    metrics = await metrics_collector.fetch_all_metrics()
+
+    # Convert to serializable format
+    result = {}
+    for service_name, service_metrics in metrics.items():
+        result[service_name] = {
+            "num_requests_running": service_metrics.num_requests_running,
+            "num_requests_waiting": service_metrics.num_requests_waiting,
+            "num_requests_swapped": service_metrics.num_requests_swapped,
+            "time_to_first_token_seconds": service_metrics.time_to_first_token_seconds,
+            "time_per_output_token_seconds": service_metrics.time_per_output_token_seconds,
+            "e2e_request_latency_seconds": service_metrics.e2e_request_latency_seconds,
+            "prompt_tokens_total": service_metrics.prompt_tokens_total,
+            "generation_tokens_total": service_metrics.generation_tokens_total,
+            "tokens_per_second": service_metrics.tokens_per_second,
+            "gpu_cache_usage_perc": service_metrics.gpu_cache_usage_perc,
+            "gpu_memory_usage": service_metrics.gpu_memory_usage,
+            "model_name": service_metrics.model_name,
+            "timestamp": service_metrics.timestamp.isoformat() if service_metrics.timestamp else None,
+            "metrics_available": any([
+                service_metrics.num_requests_running > 0,
+                service_metrics.num_requests_waiting > 0,
+                service_metrics.time_to_first_token_seconds > 0,
+                service_metrics.prompt_tokens_total > 0,
+                service_metrics.generation_tokens_total > 0,
+                service_metrics.tokens_per_second > 0
+            ])
+        }
+
+    return result
 
 
 async def check_vllm_health() -> Dict[str, bool]:
     """Check health status of all vLLM services."""
-    async with VLLMMetricsCollector() as collector:
-        health_status = {}
-        for service_name in collector.services:
-            health_status[service_name] = await collector.health_check(service_name)
-        return health_status
\ No newline at end of file
+    service_names = list(metrics_collector.services)
+    statuses = await asyncio.gather(*(metrics_collector.health_check(name) for name in service_names))
+    return dict(zip(service_names, statuses))
\ No newline at end of file